@@ -1,90 +1,677 @@
-from flask import Flask, request, render_template, redirect, url_for, session, flash, send_from_directory
+from flask import Flask, Blueprint, current_app, request, render_template, redirect, url_for, session, flash, \
+    send_from_directory, g, jsonify, abort
 import pytz
 import os
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
-from datetime import datetime
-app = Flask(__name__)
-app.secret_key = os.urandom(24)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///mygames.db'
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
+import re
+import json
+import hashlib
+import tempfile
+import io
+from flask.cli import AppGroup
+from markupsafe import Markup, escape
+from werkzeug.datastructures import FileStorage
+from jinja2 import FileSystemBytecodeCache
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from datetime import datetime, timedelta
+from page_cache import PageCache
+from image_variants import InvalidImage, build_variants, picture_sources, remove_variants, variants_missing, \
+    verify_image
+from assets import AssetManifest, BUNDLES, build_bundle, bundle_stale
+from upload_store import UploadStore, UploadTooLarge
+from catalog_import import detect_format, import_games
+from seed_data import SyntheticCatalog, seed_catalog
+from extensions import db, migrate, begin_immediate, query_inspector, upload_store, page_cache, \
+    asset_manifest, request_metrics, rate_limiters, comment_writer
+from models import Game, Comments
+from comment_queue import CommentWriter, QueueFull
+from rate_limit import TokenBucket
+from metrics import RequestMetrics
+from query_stats import QueryInspector
+from compression import CompressionMiddleware
+from functools import partial, wraps
+import math
+import time
+import click
+
+# PRAGMAs applied to every new SQLite connection. 'production' lets readers keep going while add_comment writes
+# (WAL), waits for the write lock instead of failing with "database is locked", and keeps hot pages in memory.
+# It buys write throughput, not read throughput: in benchmarks/sqlite_profile.py (8 readers, 2 writers) writes
+# go up about 1.8x while reads drop by about a fifth, since the extra writes compete for the same CPU; with no
+# writers, reads are only a few percent faster.
+SQLITE_PROFILES = {
+    'default': {},
+    'production': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'cache_size': -20000,
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+    },
+}
+
+# every route, hook, template global and CLI command; create_app() registers it on each app it builds
+site = Blueprint('site', __name__, cli_group=None)
 UPLOAD_FOLDER = os.path.join('static', 'images')
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
 
-class Game(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    gamepicture = db.Column(db.String(150))
-    gamename = db.Column(db.String(100), nullable=False)
-    description = db.Column(db.String(800), nullable=False)
-    developer = db.Column(db.String(100), nullable=False)
-    publisher = db.Column(db.String(100), nullable=False)
-    releasedate = db.Column(db.String(100), nullable=False)
+def apply_sqlite_pragmas(dbapi_connection, pragmas):
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+    cursor.close()
+
+
+def load_secret_key(app):
+    """ SECRET_KEY from the config or the environment, else a random key generated once into the instance folder,
+    so every worker process, and every restart, signs sessions with the same key """
+    key = app.config['SECRET_KEY'] or os.environ.get('SECRET_KEY')
+    if key:
+        return key
+    path = os.path.join(app.instance_path, 'secret_key')
+    if not os.path.exists(path):
+        os.makedirs(app.instance_path, exist_ok=True)
+        fd, candidate = tempfile.mkstemp(dir=app.instance_path)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(os.urandom(32))
+        try:
+            # workers starting together race here; the first link wins and the others read its key
+            os.link(candidate, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.unlink(candidate)
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def list_games(after=None, before=None, per_page=None):
+    """ Keyset page of the listing columns of Game ordered by id, plus prev/next cursors (or None). Id order is the
+    display order: an added game takes both the next id and the next position, and a delete closes the positions
+    up without reordering anything. Id cursors also stay put when a delete renumbers the positions after it. """
+    per_page = per_page or current_app.config['GAMES_PER_PAGE']
+    query = db.select(Game.id, Game.gamename, Game.gamepicture, Game.position, Game.comment_count,
+                      Game.last_comment_at)
+    if before is not None:
+        query = query.where(Game.id < before).order_by(Game.id.desc())
+    else:
+        if after is not None:
+            query = query.where(Game.id > after)
+        query = query.order_by(Game.id)
+    rows = db.session.execute(query.limit(per_page + 1)).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if before is not None:
+        rows.reverse()
+        has_prev, has_next = has_more, True
+    else:
+        has_prev, has_next = after is not None, has_more
+
+    if not rows:
+        # ran off either end of the catalog; point back at the rows we came from
+        prev_cursor = after + 1 if after is not None else None
+        next_cursor = before - 1 if before is not None else None
+        return rows, prev_cursor, next_cursor
+    return rows, rows[0].id if has_prev else None, rows[-1].id if has_next else None
+
+
+def cached_page(key):
+    """ Cached response for key, or None. A request with flash messages waiting, or one that set
+    g.skip_page_cache, is never served from (or stored in) the cache, so the message still shows up on the page
+    it was flashed for. """
+    if g.get('skip_page_cache') or session.get('_flashes'):
+        g.skip_page_cache = True
+        return None
+    entry = page_cache.get(key)
+    if entry is None:
+        return None
+    body, headers = entry
+    return current_app.response_class(body, mimetype='text/html', headers=headers)
+
+
+def cache_page(key, html, tags, headers=None):
+    response = current_app.response_class(html, mimetype='text/html', headers=headers)
+    if not g.get('skip_page_cache'):
+        page_cache.set(key, response.get_data(), headers, tags)
+    return response
+
+
+def next_game_position():
+    return db.select(db.func.coalesce(db.func.max(Game.position), 0) + 1).scalar_subquery()
+
+
+@site.before_app_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    request_metrics.started()
+    query_inspector.begin(strict=current_app.config['QUERY_REPEAT_STRICT'] or current_app.testing)
 
-    comments = db.relationship('Comments', backref='game', cascade="all, delete-orphan", lazy=True)
 
+@site.after_app_request
+def record_request_metrics(response):
+    request_metrics.finished(request.endpoint or 'unmatched', request.method, response.status_code,
+                             time.perf_counter() - g.request_started, response.content_length)
+    g.request_recorded = True
+    queries = query_inspector.current()
+    if current_app.debug and queries is not None:
+        response.headers['X-DB-Query-Count'] = str(queries.count)
+        response.headers['X-DB-Time-Ms'] = f'{queries.seconds * 1000:.2f}'
+    return response
 
-class Comments(db.Model):
-    commentid = db.Column(db.Integer, primary_key=True)
-    commentatorsname = db.Column(db.String(80), nullable=False)
-    comment = db.Column(db.String(800), nullable=False)
-    game_id = db.Column(db.Integer, db.ForeignKey('game.id'), nullable=False)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
+@site.teardown_app_request
+def record_failed_request(error):
+    query_inspector.end()
+    # after_request is skipped when the view raised; count those as 500s
+    if 'request_started' in g and not g.get('request_recorded'):
+        request_metrics.finished(request.endpoint or 'unmatched', request.method, 500,
+                                 time.perf_counter() - g.request_started, None)
 
-@app.route('/')
+
+@site.route('/metrics')
+def metrics():
+    cache = page_cache.stats()
+    extra = [('page_cache_entries', 'gauge', 'Pages in the rendered-page cache.', cache['entries']),
+             ('page_cache_bytes', 'gauge', 'Bytes of cached page bodies.', cache['bytes']),
+             ('page_cache_hits_total', 'counter', 'Rendered-page cache hits.', cache['hits']),
+             ('page_cache_misses_total', 'counter', 'Rendered-page cache misses.', cache['misses']),
+             ('page_cache_evictions_total', 'counter', 'Pages evicted to stay within the byte budget.',
+              cache['evictions'])]
+    if current_app.config['COMMENT_WRITE_BEHIND']:
+        extra.append(('comment_queue_depth', 'gauge', 'Comments waiting for the write-behind writer.',
+                      comment_writer.qsize()))
+    return current_app.response_class(request_metrics.render(extra), mimetype='text/plain; version=0.0.4')
+
+
+@site.route('/')
 def index():
-    games = Game.query.all()
-    games_list = [{'id': g.id, 'gamename': g.gamename, 'gamepicture': g.gamepicture} for g in games]
-    return render_template("homepage.html", games=games_list)
+    after = request.args.get('after', type=int)
+    before = request.args.get('before', type=int)
+    cache_key = ('index', after, before)
+    cached = cached_page(cache_key)
+    if cached is not None:
+        return cached
+    games, prev_cursor, next_cursor = list_games(after=after, before=before)
+    html = render_template("homepage.html", games=games, prev_cursor=prev_cursor, next_cursor=next_cursor)
+    return cache_page(cache_key, html, ['catalog'] + [('game', game.id) for game in games])
+
+
+@site.app_template_global()
+def game_picture_sources(filename, variant):
+    """ src and per-format srcset for the smallest variants of a game picture, falling back to the original """
+    filename = filename or 'default.jpg'
+    sources = picture_sources(os.path.join(current_app.root_path, current_app.config['UPLOAD_FOLDER']), filename, variant)
+    srcsets = {fmt: ', '.join(f"{asset_url('images/' + path)} {density}" for path, density in candidates)
+               for fmt, candidates in sources.items()}
+    if 'jpeg' in sources:
+        src = asset_url('images/' + sources['jpeg'][0][0])
+    else:
+        src = asset_url('images/' + filename)
+    return {'src': src, 'webp': srcsets.get('webp'), 'jpeg': srcsets.get('jpeg')}
+
+
+@site.app_template_global()
+def asset_url(path):
+    """ Fingerprinted URL of a file under static/, served by asset() with far-future immutable caching """
+    digest = asset_manifest.digest(path)
+    if digest is None:
+        return url_for('static', filename=path)
+    return url_for('site.asset', digest=digest, filename=path)
+
+
+def build_bundles(force=False):
+    """ (Re)build the minified CSS/JS bundles whose sources changed; returns the bundles rewritten """
+    built = []
+    for bundle, sources in BUNDLES.items():
+        if (force or bundle_stale(current_app.static_folder, bundle, sources)) \
+                and build_bundle(current_app.static_folder, bundle, sources):
+            built.append(bundle)
+    if built:
+        asset_manifest.update(*built)
+    return built
 
 
-@app.route('/display_image/<filename>')
+@site.route('/assets/<digest>/<path:filename>')
+def asset(digest, filename):
+    current = asset_manifest.digest(filename)
+    if current is None:
+        abort(404)
+    if digest != current:
+        # the file changed since this URL was handed out; never cache new content under the old hash
+        return redirect(url_for('site.asset', digest=current, filename=filename))
+    folder, path = asset_manifest.locate(filename)
+    response = send_from_directory(folder, path, etag=current, max_age=current_app.config['ASSET_MAX_AGE'])
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+@site.route('/display_image/<filename>')
 def display_image(filename):
-    return send_from_directory(UPLOAD_FOLDER, filename)
+    digest = asset_manifest.digest('images/' + filename)
+    return send_from_directory(upload_store.folder, filename, etag=digest or True)
+
+
+def encode_comment_cursor(comment):
+    return f'{comment.timestamp.isoformat()}_{comment.commentid}'
+
+
+def decode_comment_cursor(cursor):
+    try:
+        timestamp, commentid = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(timestamp), int(commentid)
+    except (AttributeError, ValueError):
+        return None
+
+
+def list_comments(game_id, older=None, per_page=None):
+    """ Newest-first keyset page of a game's comments, plus the cursor of the next (older) page or None """
+    return comment_page([Comments.game_id == game_id], older, per_page)
+
 
+def comment_page(criteria, older=None, per_page=None):
+    """ Newest-first keyset page on (timestamp, commentid) of the comments matching criteria, plus the cursor of
+    the next (older) page or None """
+    per_page = per_page or current_app.config['COMMENTS_PER_PAGE']
+    query = db.select(Comments).where(*criteria)
+    older = decode_comment_cursor(older)
+    if older is not None:
+        query = query.where(db.tuple_(Comments.timestamp, Comments.commentid) < older)
+    query = query.order_by(Comments.timestamp.desc(), Comments.commentid.desc()).limit(per_page + 1)
+    comments = db.session.scalars(query).all()
+    if len(comments) > per_page:
+        comments = comments[:per_page]
+        return comments, encode_comment_cursor(comments[-1])
+    return comments, None
 
-@app.route('/game/<int:game_id>')
+
+@site.route('/game/<int:game_id>')
 def game_page(game_id):
+    older = request.args.get('older')
+    cache_key = ('game', game_id, older)
+    pending = session.get('pending_comment')
+    if pending and pending['game_id'] == game_id:
+        # this page shows the poster their own comment, which may still be waiting in the write-behind queue;
+        # it must neither come from nor go into the shared cache
+        g.skip_page_cache = True
+    cached = cached_page(cache_key)
+    if cached is not None:
+        return cached
     game = Game.query.get(game_id)
     if game:
-        return render_template('gamepage.html', game=game)
+        comments, older_cursor = list_comments(game_id, older=older)
+        if pending and pending['game_id'] == game_id:
+            session.pop('pending_comment')
+            timestamp = datetime.fromisoformat(pending['timestamp'])
+            if older is None and not any(comment.timestamp == timestamp for comment in comments):
+                comments.insert(0, Comments(commentatorsname=pending['commentatorsname'], comment=pending['comment'],
+                                            timestamp=timestamp))
+        html = render_template('gamepage.html', game=game, comments=comments, older_cursor=older_cursor)
+        return cache_page(cache_key, html, [('game', game_id), ('comments', game_id)])
     else:
         return "Game not found", 404
 
 
-@app.route('/game/<int:game_id>/add_comment', methods=['POST'])
+@site.route('/game/<int:game_id>/comments')
+def game_comments(game_id):
+    older = request.args.get('older')
+    cache_key = ('comments', game_id, older)
+    cached = cached_page(cache_key)
+    if cached is not None:
+        return cached
+    comments, older_cursor = list_comments(game_id, older=older)
+    headers = {'X-Older-Cursor': older_cursor} if older_cursor else None
+    return cache_page(cache_key, render_template('commentlist.html', comments=comments), [('comments', game_id)],
+                      headers)
+
+
+def rate_limited(name):
+    """ Throttle POSTs to the view per client IP with rate_limiters[name], answering 429 before the view runs """
+    def decorator(view):
+        @wraps(view)
+        def throttled(*args, **kwargs):
+            limiter = rate_limiters.get(name)
+            if request.method == 'POST' and limiter is not None:
+                retry_after = limiter.hit(request.remote_addr)
+                if retry_after:
+                    return 'Too many requests, please slow down.', 429, {'Retry-After': str(math.ceil(retry_after))}
+            return view(*args, **kwargs)
+        return throttled
+    return decorator
+
+
+@site.route('/game/<int:game_id>/add_comment', methods=['POST'])
+@rate_limited('comment')
 def add_comment(game_id):
     name = request.form.get('name')
     comment_text = request.form.get('comment')
     if not name or not comment_text:
         flash('Both name and comment are required.', 'error')
-        return redirect(url_for('game_page', game_id=game_id))
-    new_comment = Comments(commentatorsname=name, comment=comment_text, game_id=game_id)
+        return redirect(url_for('site.game_page', game_id=game_id))
+    if current_app.config['COMMENT_WRITE_BEHIND'] and queue_comment(game_id, name, comment_text):
+        flash('Comment added successfully!', 'success')
+        return redirect(url_for('site.game_page', game_id=game_id))
+    new_comment = Comments(commentatorsname=name, comment=comment_text, game_id=game_id, timestamp=datetime.utcnow())
+    counted = db.session.execute(db.update(Game).where(Game.id == game_id)
+                                 .values(comment_count=Game.comment_count + 1, version=Game.version + 1,
+                                         last_comment_at=new_comment.timestamp))
+    if counted.rowcount == 0:
+        db.session.rollback()
+        return "Game not found", 404
     db.session.add(new_comment)
     db.session.commit()
+    page_cache.invalidate(('game', game_id), ('comments', game_id))
     flash('Comment added successfully!', 'success')
-    return redirect(url_for('game_page', game_id=game_id))
+    return redirect(url_for('site.game_page', game_id=game_id))
+
+
+def queue_comment(game_id, name, comment_text):
+    """ Hand a comment to the write-behind queue; False if the queue is full and it must be written directly.
+    The poster's session remembers it so the redirected game page can show it before the batch commits. """
+    if db.session.scalar(db.select(Game.id).where(Game.id == game_id)) is None:
+        abort(404)
+    pending = {'game_id': game_id, 'commentatorsname': name, 'comment': comment_text,
+               'timestamp': datetime.utcnow().isoformat()}
+    try:
+        comment_writer.submit(pending)
+    except QueueFull:
+        return False
+    session['pending_comment'] = pending
+    return True
+
+
+def write_comment_batch(app, comments, replay=False):
+    """ Insert a group of queued comments and bump their games' stats in one transaction; runs on the comment
+    writer's thread, so it sets up app's context itself """
+    with app.app_context():
+        rows = [{'game_id': c['game_id'], 'commentatorsname': c['commentatorsname'], 'comment': c['comment'],
+                 'timestamp': datetime.fromisoformat(c['timestamp'])} for c in comments]
+        begin_immediate()
+        live_games = set(db.session.scalars(db.select(Game.id).where(Game.id.in_({row['game_id'] for row in rows}))))
+        rows = [row for row in rows if row['game_id'] in live_games]
+        if replay:
+            rows = [row for row in rows if db.session.scalar(
+                db.select(Comments.commentid).where(Comments.game_id == row['game_id'],
+                                                    Comments.timestamp == row['timestamp'],
+                                                    Comments.commentatorsname == row['commentatorsname'],
+                                                    Comments.comment == row['comment']).limit(1)) is None]
+        if not rows:
+            db.session.rollback()
+            return
+
+        stats = {}
+        for row in rows:
+            added, last = stats.get(row['game_id'], (0, row['timestamp']))
+            stats[row['game_id']] = (added + 1, max(last, row['timestamp']))
+        game = Game.__table__
+        db.session.execute(db.insert(Comments), rows)
+        db.session.execute(
+            game.update().where(game.c.id == db.bindparam('game_id'))
+            .values(comment_count=game.c.comment_count + db.bindparam('added'), version=game.c.version + 1,
+                    last_comment_at=db.func.max(db.func.coalesce(game.c.last_comment_at,
+                                                                 db.bindparam('last', type_=db.DateTime)),
+                                                db.bindparam('last', type_=db.DateTime))),
+            [{'game_id': game_id, 'added': added, 'last': last} for game_id, (added, last) in stats.items()])
+        db.session.commit()
+        for game_id in stats:
+            page_cache.invalidate(('game', game_id), ('comments', game_id))
+
+
+HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE = '\x02', '\x03'
+
+
+def fts_query(text):
+    """ FTS5 MATCH expression for free text: every word must match, with FTS syntax neutralised """
+    return ' '.join(f'"{word}"' for word in re.findall(r'\w+', text or ''))
+
+
+def highlighted(text):
+    """ Escape an FTS snippet and turn its highlight markers into <mark> tags """
+    return Markup(str(escape(text)).replace(HIGHLIGHT_OPEN, '<mark>').replace(HIGHLIGHT_CLOSE, '</mark>'))
+
+
+def ranked_matches(table, match, limit):
+    """ rowids of the limit best bm25 matches in an FTS table. FTS5 scores every match before sorting, about 1.5 us
+    a row: a word in 8.5k of 100k comments takes 12-15 ms. Ranking fewer rows would drop relevant older ones. """
+    return db.session.scalars(db.text(
+        f"SELECT rowid FROM {table} WHERE {table} MATCH :match ORDER BY rank LIMIT :limit"),
+        {'match': match, 'limit': limit}).all()
+
+
+def search_catalog(text, limit=20):
+    """ Best-ranked games and comments matching text, with highlighted snippets """
+    match = fts_query(text)
+    if not match:
+        return [], []
+    params = {'match': match, 'open': HIGHLIGHT_OPEN, 'close': HIGHLIGHT_CLOSE}
+
+    game_ids = ranked_matches('game_fts', match, limit)
+    games = db.session.execute(db.text(
+        "SELECT game.id, game.gamename, game.gamepicture, "
+        "       highlight(game_fts, 0, :open, :close) AS name_snippet, "
+        "       snippet(game_fts, 1, :open, :close, '…', 24) AS description_snippet "
+        "FROM game_fts JOIN game ON game.id = game_fts.rowid "
+        "WHERE game_fts MATCH :match AND game_fts.rowid IN :ids"
+    ).bindparams(db.bindparam('ids', expanding=True)), dict(params, ids=game_ids)).all() if game_ids else []
+
+    comment_ids = ranked_matches('comment_fts', match, limit)
+    comments = db.session.execute(db.text(
+        "SELECT comments.commentid, comments.commentatorsname, comments.timestamp, comments.game_id, "
+        "       game.gamename, snippet(comment_fts, 0, :open, :close, '…', 24) AS comment_snippet "
+        "FROM comment_fts JOIN comments ON comments.commentid = comment_fts.rowid "
+        "JOIN game ON game.id = comments.game_id "
+        "WHERE comment_fts MATCH :match AND comment_fts.rowid IN :ids"
+    ).bindparams(db.bindparam('ids', expanding=True)).columns(timestamp=db.DateTime),
+        dict(params, ids=comment_ids)).all() if comment_ids else []
+
+    games.sort(key=lambda row: game_ids.index(row.id))
+    comments.sort(key=lambda row: comment_ids.index(row.commentid))
+    return games, comments
+
+
+@site.route('/search')
+def search():
+    query = request.args.get('q', '').strip()
+    games, comments = search_catalog(query)
+    return render_template('searchpage.html', query=query, games=games, comments=comments, highlighted=highlighted)
+
+
+API_GAME_FIELDS = {'id': Game.id, 'gamename': Game.gamename, 'description': Game.description,
+                   'developer': Game.developer, 'publisher': Game.publisher, 'releasedate': Game.releasedate,
+                   'gamepicture': Game.gamepicture, 'comment_count': Game.comment_count,
+                   'last_comment_at': Game.last_comment_at}
+API_COMMENT_FIELDS = {'commentid': Comments.commentid, 'commentatorsname': Comments.commentatorsname,
+                      'comment': Comments.comment, 'timestamp': Comments.timestamp}
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+@site.app_errorhandler(ApiError)
+def api_error(error):
+    return jsonify(error=str(error)), error.status
+
+
+def api_fields(allowed):
+    """ Columns picked by ?fields=a,b (all of allowed by default) """
+    names = [name for name in request.args.get('fields', '').split(',') if name] or list(allowed)
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise ApiError(f'unknown fields: {", ".join(unknown)}')
+    return names
+
+
+def api_limit():
+    limit = request.args.get('limit', current_app.config['API_PAGE_SIZE'], type=int)
+    return max(1, min(limit, current_app.config['API_MAX_PAGE_SIZE']))
+
+
+def api_etag(*parts):
+    return hashlib.sha256(repr(parts).encode()).hexdigest()[:32]
 
 
-@app.route('/login', methods=['GET', 'POST'])
+def api_not_modified(etag):
+    # weak comparison: the compression middleware hands out W/ versions of these ETags
+    return request.if_none_match.contains_weak(etag)
+
+
+def api_response(payload, etag):
+    body = json.dumps(payload, separators=(',', ':'), default=lambda value: value.isoformat())
+    response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+
+def api_not_modified_response(etag):
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+
+@site.route('/api/games')
+def api_games():
+    fields = api_fields(API_GAME_FIELDS)
+    limit = api_limit()
+    after = request.args.get('after', type=int)
+    query = db.select(Game.id, Game.version).order_by(Game.id).limit(limit + 1)
+    if after is not None:
+        query = query.where(Game.id > after)
+    versions = db.session.execute(query).all()
+    has_more = len(versions) > limit
+    versions = versions[:limit]
+
+    etag = api_etag('games', fields, after, limit, has_more, [tuple(row) for row in versions])
+    if api_not_modified(etag):
+        return api_not_modified_response(etag)
+
+    ids = [row.id for row in versions]
+    rows = db.session.execute(db.select(*[API_GAME_FIELDS[name] for name in fields])
+                              .where(Game.id.in_(ids)).order_by(Game.id)).all() if ids else []
+    return api_response({'games': [dict(zip(fields, row)) for row in rows],
+                         'next': ids[-1] if has_more else None}, etag)
+
+
+@site.route('/api/games/<int:game_id>')
+def api_game(game_id):
+    fields = api_fields(API_GAME_FIELDS)
+    version = db.session.scalar(db.select(Game.version).where(Game.id == game_id))
+    if version is None:
+        raise ApiError('game not found', 404)
+    etag = api_etag('game', game_id, version, fields)
+    if api_not_modified(etag):
+        return api_not_modified_response(etag)
+    row = db.session.execute(db.select(*[API_GAME_FIELDS[name] for name in fields]).where(Game.id == game_id)).one()
+    return api_response(dict(zip(fields, row)), etag)
+
+
+@site.route('/api/games/<int:game_id>/comments')
+def api_game_comments(game_id):
+    fields = api_fields(API_COMMENT_FIELDS)
+    limit = api_limit()
+    older = request.args.get('older')
+    # comments are only ever added or deleted, and both bump the game's version
+    version = db.session.scalar(db.select(Game.version).where(Game.id == game_id))
+    if version is None:
+        raise ApiError('game not found', 404)
+    etag = api_etag('comments', game_id, version, fields, older, limit)
+    if api_not_modified(etag):
+        return api_not_modified_response(etag)
+
+    query = db.select(Comments.timestamp, Comments.commentid, *[API_COMMENT_FIELDS[name] for name in fields]) \
+        .where(Comments.game_id == game_id)
+    cursor = decode_comment_cursor(older)
+    if cursor is not None:
+        query = query.where(db.tuple_(Comments.timestamp, Comments.commentid) < cursor)
+    rows = db.session.execute(query.order_by(Comments.timestamp.desc(), Comments.commentid.desc())
+                              .limit(limit + 1)).all()
+    next_cursor = encode_comment_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return api_response({'comments': [dict(zip(fields, row[2:])) for row in rows[:limit]], 'next': next_cursor},
+                        etag)
+
+
+@site.route('/login', methods=['GET', 'POST'])
+@rate_limited('login')
 def login():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
         if username == 'admin' and password == 'password123':
             session['logged_in'] = True
-            return redirect(url_for('admin'))
+            return redirect(url_for('site.admin'))
         else:
             flash('Access Denied!', 'error')
     return render_template('loginpage.html')
 
 
-@app.route('/admin', methods=['GET', 'POST'])
+def refresh_comment_stats(*criteria):
+    """ Recompute comment_count/last_comment_at of the games matching criteria from the comments table in one
+    UPDATE; both subqueries are served by ix_comments_game_id_timestamp. Returns the number of games changed. """
+    count = db.select(db.func.count()).where(Comments.game_id == Game.id).scalar_subquery()
+    last = db.select(db.func.max(Comments.timestamp)).where(Comments.game_id == Game.id).scalar_subquery()
+    result = db.session.execute(db.update(Game).where(*criteria)
+                                .where((Game.comment_count != count) | Game.last_comment_at.is_distinct_from(last))
+                                .values(comment_count=count, last_comment_at=last, version=Game.version + 1)
+                                .execution_options(synchronize_session=False))
+    return result.rowcount
+
+
+def delete_comments(criteria, dry_run=False):
+    """ Delete every comment matching criteria in one DELETE, then repair the stats and cached pages of the games
+    they were on. Returns (number of comments, their game ids); with dry_run nothing is deleted. """
+    if dry_run:
+        count = db.session.scalar(db.select(db.func.count()).select_from(Comments).where(*criteria))
+        game_ids = set(db.session.scalars(db.select(Comments.game_id).where(*criteria).distinct()))
+        return count, game_ids
+    begin_immediate()
+    game_ids = set(db.session.scalars(db.select(Comments.game_id).where(*criteria).distinct()))
+    deleted = db.session.execute(db.delete(Comments).where(*criteria)
+                                 .execution_options(synchronize_session=False)).rowcount
+    if deleted:
+        refresh_comment_stats(Game.id.in_(game_ids))
+    db.session.commit()
+    for game_id in game_ids:
+        page_cache.invalidate(('game', game_id), ('comments', game_id))
+    return deleted, game_ids
+
+
+def store_game_picture(file):
+    """ Stream an uploaded picture into the content-addressed store and build its variants; returns the name
+    to keep in Game.gamepicture. Raises UploadTooLarge, or InvalidImage if it does not decode. """
+    filename, created = upload_store.save(file.stream, validate=verify_image)
+    # an earlier upload of the same bytes may have stopped between storing the blob and resizing it
+    if variants_missing(upload_store.folder, filename):
+        try:
+            variants = build_variants(upload_store.folder, filename)
+        except InvalidImage:
+            if created:
+                upload_store.delete(filename)
+            raise
+        asset_manifest.update('images/' + filename, *['images/' + path for path in variants])
+    return filename
+
+
+def release_game_picture(filename):
+    """ Drop a stored picture and its variants once no game references it any more """
+    if not upload_store.owns(filename):
+        return
+    references = db.session.scalar(db.select(db.func.count()).where(Game.gamepicture == filename))
+    if references == 0:
+        upload_store.delete(filename)
+        removed = remove_variants(upload_store.folder, filename)
+        asset_manifest.update('images/' + filename, *['images/' + path for path in removed])
+
+
+@site.route('/admin', methods=['GET', 'POST'])
 def admin():
     if not session.get('logged_in'):
-        return redirect(url_for('login'))
+        return redirect(url_for('site.login'))
 
     if request.method == 'POST':
         action = request.form.get('action')
@@ -98,29 +685,33 @@ def admin():
 
             if not (gamename and description and developer and publisher and releasedate):
                 flash('All fields must be filled out, except id when adding a new game.', 'error')
-                return redirect(url_for('admin'))
+                return redirect(url_for('site.admin'))
 
             if len(gamename) > 100 or len(description) > 800 or len(developer) > 100 or len(publisher) > 100:
                 flash('Field lengths exceed the allowed limit', 'error')
-                return redirect(url_for('admin'))
+                return redirect(url_for('site.admin'))
 
             if 'gamepicture' in request.files and request.files['gamepicture'].filename != '':
-                file = request.files['gamepicture']
-                filename = file.filename
-                image_folder = os.path.join(app.config['UPLOAD_FOLDER'])
-                if not os.path.exists(image_folder):
-                    os.makedirs(image_folder)
-                file_path = os.path.join(image_folder, filename)
-                file.save(file_path)
+                try:
+                    filename = store_game_picture(request.files['gamepicture'])
+                except UploadTooLarge:
+                    flash(f'Game picture exceeds the {current_app.config["MAX_PICTURE_BYTES"] // (1024 * 1024)} MB limit',
+                          'error')
+                    return redirect(url_for('site.admin'))
+                except InvalidImage:
+                    flash('Game picture is not a valid image', 'error')
+                    return redirect(url_for('site.admin'))
             else:
                 filename = 'default.jpg'
 
             new_game = Game(gamepicture=filename, gamename=gamename, description=description,
-                            developer=developer, publisher=publisher, releasedate=releasedate)
+                            developer=developer, publisher=publisher, releasedate=releasedate,
+                            position=next_game_position())
             db.session.add(new_game)
             db.session.commit()
+            page_cache.invalidate('catalog')
             flash('Game added successfully!', 'success')
-            return redirect(url_for('admin'))
+            return redirect(url_for('site.admin'))
             pass
 
         elif action == 'update':
@@ -128,7 +719,7 @@ def admin():
             game = Game.query.get(game_id)
             if not game:
                 flash(f'No game found with ID {game_id}', 'error')
-                return redirect(url_for('admin'))
+                return redirect(url_for('site.admin'))
 
             gamename = request.form.get('gamename')
             description = request.form.get('description')
@@ -138,7 +729,7 @@ def admin():
 
             if len(gamename) > 100 or len(description) > 800 or len(developer) > 100 or len(publisher) > 100:
                 flash('Field lengths exceed the allowed limit', 'error')
-                return redirect(url_for('admin'))
+                return redirect(url_for('site.admin'))
 
             if gamename:
                 game.gamename = gamename
@@ -150,58 +741,407 @@ def admin():
                 game.publisher = publisher
             if releasedate:
                 game.releasedate = releasedate
+            game.version = Game.version + 1
 
+            old_picture = game.gamepicture
             if 'gamepicture' in request.files and request.files['gamepicture'].filename != '':
-                file = request.files['gamepicture']
-                filename = file.filename
-                image_folder = os.path.join(app.config['UPLOAD_FOLDER'])
-                if not os.path.exists(image_folder):
-                    os.makedirs(image_folder)
-                file_path = os.path.join(image_folder, filename)
-                file.save(file_path)
-                game.gamepicture = filename
+                try:
+                    game.gamepicture = store_game_picture(request.files['gamepicture'])
+                except UploadTooLarge:
+                    flash(f'Game picture exceeds the {current_app.config["MAX_PICTURE_BYTES"] // (1024 * 1024)} MB limit',
+                          'error')
+                    return redirect(url_for('site.admin'))
+                except InvalidImage:
+                    flash('Game picture is not a valid image', 'error')
+                    return redirect(url_for('site.admin'))
 
             db.session.commit()
+            page_cache.invalidate(('game', game.id))
+            if game.gamepicture != old_picture:
+                release_game_picture(old_picture)
             flash(f'Game with ID {game_id} updated successfully!', 'success')
-            return redirect(url_for('admin'))
+            return redirect(url_for('site.admin'))
 
         elif action == 'delete':
             game_id = request.form.get('id')
             game = Game.query.get(game_id)
             if game:
+                # ids stay stable for comments and bookmarked URLs; only the display order closes the gap
+                position = game.position
                 db.session.delete(game)
+                db.session.execute(db.update(Game).where(Game.position > position)
+                                   .values(position=Game.position - 1))
                 db.session.commit()
+                page_cache.invalidate('catalog', ('game', game.id), ('comments', game.id))
+                release_game_picture(game.gamepicture)
                 flash(f'Game with ID {game_id} deleted successfully!', 'success')
-                higher_games = Game.query.filter(Game.id > game_id).all()
-                for g in higher_games:
-                    g.id -= 1
-                db.session.commit()
             else:
                 flash(f'No game found with ID {game_id}', 'error')
-            return redirect(url_for('admin'))
+            return redirect(url_for('site.admin'))
 
         elif action == 'delete_comment':
-            comment_id = request.form.get('commentid')
-            comment = Comments.query.get(comment_id)
-            if comment:
-                db.session.delete(comment)
-                db.session.commit()
+            comment_id = request.form.get('commentid', type=int)
+            deleted = 0
+            if comment_id is not None:
+                deleted, _ = delete_comments([Comments.commentid == comment_id])
+            if deleted:
                 flash(f'Comment with ID {comment_id} deleted successfully!', 'success')
             else:
-                flash(f'No comment found with ID {comment_id}', 'error')
-            return redirect(url_for('admin'))
+                flash(f'No comment found with ID {request.form.get("commentid")}', 'error')
+            return redirect(url_for('site.admin'))
+
+    games, prev_cursor, next_cursor = list_games(after=request.args.get('after', type=int),
+                                                 before=request.args.get('before', type=int))
+    filters, criteria = moderation_filters(request.args)
+    comments, older_cursor = comment_page(criteria, request.args.get('older'), current_app.config['MODERATION_PAGE_SIZE'])
+    return render_template('adminpage.html', games=games, prev_cursor=prev_cursor, next_cursor=next_cursor,
+                           comments=comments, older_cursor=older_cursor, filters=filters)
 
-    games = Game.query.all()
-    games_list = [{'id': g.id, 'gamename': g.gamename, 'gamepicture': g.gamepicture} for g in games]
-    comments = Comments.query.all()
-    return render_template('adminpage.html', games=games_list, comments=comments)
 
+def moderation_filters(args):
+    """ The comment filters given in args and the criteria they stand for. Each is served by an index on its column
+    plus timestamp (the keyset order): game by game_id, name (exact match) by commentatorsname, since/until by
+    timestamp alone. """
+    filters, criteria = {}, []
+    game_id = args.get('game', type=int)
+    if game_id is not None:
+        filters['game'] = game_id
+        criteria.append(Comments.game_id == game_id)
+    name = args.get('name', '').strip()
+    if name:
+        filters['name'] = name
+        criteria.append(Comments.commentatorsname == name)
+    for field in ('since', 'until'):
+        try:
+            day = datetime.strptime(args.get(field, ''), '%Y-%m-%d')
+        except ValueError:
+            continue
+        filters[field] = day.strftime('%Y-%m-%d')
+        criteria.append(Comments.timestamp >= day if field == 'since' else Comments.timestamp < day + timedelta(days=1))
+    return filters, criteria
 
-@app.route('/logout')
+
+@site.route('/admin/comments')
+def admin_comments():
+    """ One page of the admin moderation list as <li> fragments, for the filter form and "older" link """
+    if not session.get('logged_in'):
+        return redirect(url_for('site.login'))
+    filters, criteria = moderation_filters(request.args)
+    comments, older_cursor = comment_page(criteria, request.args.get('older'), current_app.config['MODERATION_PAGE_SIZE'])
+    headers = {'X-Older-Cursor': older_cursor} if older_cursor else {}
+    return render_template('moderationlist.html', comments=comments), headers
+
+
+def bulk_comment_criteria(form):
+    """ Criteria and a short description of the comments a bulk moderation form selects; raises ValueError when
+    the form does not pin a selection down """
+    mode = form.get('mode')
+    if mode == 'ids':
+        try:
+            ids = {int(part) for part in re.split(r'[\s,]+', form.get('ids', '').strip()) if part}
+        except ValueError:
+            raise ValueError('Comment IDs must be whole numbers separated by commas or spaces')
+        if not ids:
+            raise ValueError('Enter at least one comment ID')
+        if len(ids) > current_app.config['BULK_DELETE_MAX_IDS']:
+            raise ValueError(f'At most {current_app.config["BULK_DELETE_MAX_IDS"]} comment IDs at a time')
+        return [Comments.commentid.in_(ids)], f'out of {len(ids)} listed IDs'
+    if mode == 'name':
+        name = form.get('name', '').strip()
+        if not name:
+            raise ValueError('Enter the commenter name')
+        return [Comments.commentatorsname == name], f'by {name}'
+    if mode == 'game':
+        game_id = form.get('game', type=int)
+        if game_id is None:
+            raise ValueError('Enter the game ID')
+        criteria, description = [Comments.game_id == game_id], f'on game {game_id}'
+        try:
+            since = datetime.fromisoformat(form['since']) if form.get('since') else None
+            until = datetime.fromisoformat(form['until']) if form.get('until') else None
+        except ValueError:
+            raise ValueError('Invalid time window')
+        if since:
+            criteria.append(Comments.timestamp >= since)
+            description += f' from {since:%Y-%m-%d %H:%M}'
+        if until:
+            criteria.append(Comments.timestamp < until)
+            description += f' until {until:%Y-%m-%d %H:%M}'
+        return criteria, description
+    if mode == 'text':
+        pattern = form.get('pattern', '').strip()
+        if not pattern:
+            raise ValueError('Enter the text to match')
+        return [Comments.comment.contains(pattern, autoescape=True)], f'containing "{pattern}"'
+    raise ValueError('Choose which comments to delete')
+
+
+@site.route('/admin/comments/delete', methods=['POST'])
+def admin_delete_comments():
+    if not session.get('logged_in'):
+        return redirect(url_for('site.login'))
+    try:
+        criteria, description = bulk_comment_criteria(request.form)
+    except ValueError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('site.admin'))
+    if request.form.get('dry_run'):
+        count, game_ids = delete_comments(criteria, dry_run=True)
+        flash(f'Dry run: {count} comments ({description}) across {len(game_ids)} games would be deleted.', 'success')
+    else:
+        count, game_ids = delete_comments(criteria)
+        flash(f'Deleted {count} comments ({description}) across {len(game_ids)} games.', 'success')
+    return redirect(url_for('site.admin'))
+
+
+@site.route('/admin/import', methods=['POST'])
+def admin_import():
+    if not session.get('logged_in'):
+        return redirect(url_for('site.login'))
+    request.max_content_length = current_app.config['MAX_IMPORT_BYTES']
+    file = request.files.get('catalog')
+    if not file or file.filename == '':
+        flash('Choose a CSV or NDJSON file to import.', 'error')
+        return redirect(url_for('site.admin'))
+
+    report = import_games(file.stream, detect_format(file.filename))
+    flash(report.summary(), 'success' if report.inserted else 'error')
+    for line, message in report.errors[:20]:
+        flash(f'Line {line}: {message}', 'error')
+    if len(report.errors) > 20:
+        flash(f'... and {len(report.errors) - 20} more rejected rows', 'error')
+    return redirect(url_for('site.admin'))
+
+
+@site.route('/admin/cache_stats')
+def cache_stats():
+    if not session.get('logged_in'):
+        return redirect(url_for('site.login'))
+    return jsonify(page_cache.stats())
+
+
+@site.route('/logout')
 def logout():
     session.pop('logged_in', None)
-    return redirect(url_for('login'))
+    return redirect(url_for('site.login'))
+
+
+images_cli = AppGroup('images', help='Manage game pictures.')
+
+
+@images_cli.command('build')
+def build_image_variants():
+    """ (Re)generate the resized JPEG/WebP variants of every picture in the upload folder """
+    image_folder = os.path.join(current_app.root_path, current_app.config['UPLOAD_FOLDER'])
+    invalid = []
+    for filename in sorted(os.listdir(image_folder)):
+        if os.path.isfile(os.path.join(image_folder, filename)):
+            try:
+                written = build_variants(image_folder, filename)
+            except InvalidImage as e:
+                invalid.append(filename)
+                click.echo(f'{filename}: skipped, not a valid image ({e.__cause__})', err=True)
+                continue
+            click.echo(f'{filename}: {len(written)} variants')
+    if invalid:
+        click.echo(f'{len(invalid)} files skipped: {", ".join(invalid)}', err=True)
+
+
+@images_cli.command('gc')
+def collect_image_garbage():
+    """ Delete stored pictures (and their variants) that no game references """
+    referenced = set(db.session.scalars(db.select(Game.gamepicture).distinct()))
+    for filename in upload_store.blobs():
+        if filename not in referenced:
+            upload_store.delete(filename)
+            remove_variants(upload_store.folder, filename)
+            click.echo(f'removed {filename}')
+
+
+site.cli.add_command(images_cli)
+
+assets_cli = AppGroup('assets', help='Manage the CSS/JS bundles.')
+
+
+@assets_cli.command('build')
+def build_assets_command():
+    """ Rebuild every minified CSS/JS bundle under static/dist """
+    built = build_bundles(force=True)
+    for bundle in BUNDLES:
+        click.echo(f'{bundle}: {"rebuilt" if bundle in built else "unchanged"} ({asset_manifest.digest(bundle)})')
+
+
+site.cli.add_command(assets_cli)
+
+games_cli = AppGroup('games', help='Manage the game catalog.')
+
+
+@games_cli.command('repair-counts')
+def repair_comment_counts():
+    """ Recompute every game's comment_count and last_comment_at from the comments table """
+    repaired = refresh_comment_stats()
+    db.session.commit()
+    page_cache.clear()
+    click.echo(f'{repaired} games repaired')
+
+
+@games_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), help='Defaults to the file extension.')
+@click.option('--batch-size', type=int, help='Rows per INSERT batch.')
+def import_games_command(path, fmt, batch_size):
+    """ Import games from a CSV or NDJSON file in a single transaction """
+    with open(path, 'rb') as stream:
+        report = import_games(stream, fmt or detect_format(path), batch_size)
+    for line, message in report.errors:
+        click.echo(f'line {line}: {message}')
+    click.echo(report.summary())
+
+
+site.cli.add_command(games_cli)
+
+
+@site.cli.command('seed')
+@click.option('--games', type=int, default=1000, show_default=True, help='Games to generate.')
+@click.option('--comments', type=int, default=100000, show_default=True, help='Comments spread over the new games.')
+@click.option('--seed', type=int, default=0, show_default=True, help='Random seed; the same seed gives the same data.')
+@click.option('--skew', type=float, default=1.1, show_default=True,
+              help='Zipf exponent of comments per game; 0 spreads them evenly.')
+@click.option('--days', type=int, default=365, show_default=True, help='Days of comment history.')
+@click.option('--pictures', type=int, default=8, show_default=True,
+              help='Distinct placeholder covers to generate (needs Pillow); 0 uses default.jpg.')
+@click.option('--batch-size', type=int, default=10000, show_default=True, help='Rows per INSERT batch.')
+def seed_command(games, comments, seed, skew, days, pictures, batch_size):
+    """ Bulk-generate a synthetic catalog of games and comments for load testing """
+    started = time.perf_counter()
+    catalog = SyntheticCatalog(seed=seed, skew=skew, days=days)
+    filenames = []
+    for number in range(pictures):
+        picture = catalog.picture()
+        if picture is None:
+            break
+        filenames.append(store_game_picture(FileStorage(io.BytesIO(picture), f'seed-{seed}-{number}.jpg')))
+    game_ids = seed_catalog(catalog, games, comments, filenames, batch_size)
+    if game_ids:
+        click.echo(f'games {game_ids[0]}-{game_ids[-1]}: {comments} comments, {len(filenames)} pictures '
+                   f'in {time.perf_counter() - started:.1f}s')
+    else:
+        click.echo('nothing to seed')
+
+
+def uses_queue_pool(uri):
+    """ Whether SQLAlchemy pools connections to uri in a QueuePool. In-memory SQLite gets a StaticPool instead,
+    which refuses the pool size options. """
+    url = make_url(uri)
+    return url.get_backend_name() != 'sqlite' or url.database not in (None, '', ':memory:')
+
+
+def create_app(config=None, instance_path=None):
+    """ Build the app. config is a mapping of settings that override the defaults below; instance_path moves the
+    instance folder (secret key, asset manifest, comment journal) away from ./instance """
+    app = Flask(__name__, instance_path=instance_path)
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///mygames.db')
+    app.config['SQLITE_PROFILE'] = os.environ.get('SQLITE_PROFILE', 'production')
+    # statements slower than this are logged with their query plan
+    app.config['SLOW_QUERY_MS'] = float(os.environ.get('SLOW_QUERY_MS', 100))
+    # more repeats of one statement shape per request than this is reported as a likely N+1; strict mode (or
+    # app.testing) raises instead of logging
+    app.config['QUERY_REPEAT_LIMIT'] = 10
+    app.config['QUERY_REPEAT_STRICT'] = os.environ.get('QUERY_REPEAT_STRICT') == '1'
+    # relative to the app's root; an absolute path keeps uploads outside the static folder
+    app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+    app.config['MAX_PICTURE_BYTES'] = 5 * 1024 * 1024
+    app.config['GAMES_PER_PAGE'] = 24
+    app.config['COMMENTS_PER_PAGE'] = 20
+    app.config['MODERATION_PAGE_SIZE'] = 50
+    app.config['BULK_DELETE_MAX_IDS'] = 10000
+    app.config['IMPORT_BATCH_SIZE'] = 1000
+    app.config['API_PAGE_SIZE'] = 50
+    app.config['API_MAX_PAGE_SIZE'] = 200
+    # write-behind mode for add_comment: comments are journaled, queued and committed in groups by a background
+    # thread
+    app.config['COMMENT_WRITE_BEHIND'] = os.environ.get('COMMENT_WRITE_BEHIND') == '1'
+    app.config['COMMENT_QUEUE_SIZE'] = 10000
+    app.config['COMMENT_BATCH_ROWS'] = 200
+    app.config['COMMENT_FLUSH_MS'] = 50
+    app.config['COMMENT_JOURNAL_FSYNC'] = False
+    app.config['MAX_IMPORT_BYTES'] = 64 * 1024 * 1024
+    # (burst, tokens refilled per second) per client IP for each throttled action; None turns a limit off. The
+    # buckets live in the process, so each worker keeps its own.
+    app.config['RATE_LIMITS'] = {'comment': (10, 0.5), 'login': (20, 1 / 3)}
+    app.config['RATE_LIMIT_MAX_CLIENTS'] = 10000
+    # reverse proxies in front of the app whose X-Forwarded-For entries are trusted for the client address;
+    # wsgi.py applies it with ProxyFix
+    app.config['TRUSTED_PROXIES'] = 0
+    app.config['PAGE_CACHE_MAX_BYTES'] = 8 * 1024 * 1024
+    # seconds a cached page may be served; None keeps it until a write invalidates it, which is only safe with a
+    # single process, because a write only invalidates the cache of the worker that handled it
+    app.config['PAGE_CACHE_TTL'] = None
+    app.config['ASSET_MAX_AGE'] = 365 * 24 * 60 * 60
+    # rebuild stale CSS/JS bundles while the app starts; deploys that run 'flask assets build' can turn this off
+    app.config['BUILD_ASSETS_ON_STARTUP'] = True
+    # directory for compiled templates, so a fresh worker does not recompile every template on its first requests
+    app.config['JINJA_BYTECODE_CACHE_DIR'] = None
+    app.config['COMPRESS_MIN_BYTES'] = 1024
+    app.config['COMPRESS_CACHE_BYTES'] = 16 * 1024 * 1024
+    app.config.from_mapping(config or {})
+    if uses_queue_pool(app.config['SQLALCHEMY_DATABASE_URI']):
+        # explicit SQLALCHEMY_ENGINE_OPTIONS in config win over these
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+            'max_overflow': int(os.environ.get('DB_POOL_MAX_OVERFLOW', 20)),
+            'pool_timeout': 30,
+            **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}),
+        }
+    if app.config['MAX_CONTENT_LENGTH'] is None:
+        # werkzeug refuses anything bigger while parsing the form, before admin() runs
+        app.config['MAX_CONTENT_LENGTH'] = app.config['MAX_PICTURE_BYTES'] + 64 * 1024
+    app.secret_key = load_secret_key(app)
+    if app.config['JINJA_BYTECODE_CACHE_DIR']:
+        os.makedirs(app.config['JINJA_BYTECODE_CACHE_DIR'], exist_ok=True)
+        app.jinja_options = dict(app.jinja_options,
+                                 bytecode_cache=FileSystemBytecodeCache(app.config['JINJA_BYTECODE_CACHE_DIR']))
+
+    db.init_app(app)
+    migrate.init_app(app, db)
+    inspector = QueryInspector(app.config['SLOW_QUERY_MS'] / 1000, app.config['QUERY_REPEAT_LIMIT'])
+    app.extensions['query_inspector'] = inspector
+    upload_folder = os.path.join(app.root_path, app.config['UPLOAD_FOLDER'])
+    app.extensions['upload_store'] = UploadStore(upload_folder, app.config['MAX_PICTURE_BYTES'])
+    app.extensions['page_cache'] = PageCache(app.config['PAGE_CACHE_MAX_BYTES'], ttl=app.config['PAGE_CACHE_TTL'])
+    app.extensions['asset_manifest'] = AssetManifest(app.static_folder,
+                                                     os.path.join(app.instance_path, 'asset-manifest.json'),
+                                                     mounts={'images': upload_folder})
+    app.extensions['request_metrics'] = RequestMetrics()
+    app.extensions['rate_limiters'] = {name: TokenBucket(*limit, max_keys=app.config['RATE_LIMIT_MAX_CLIENTS'])
+                                       for name, limit in app.config['RATE_LIMITS'].items() if limit}
+    app.register_blueprint(site)
+    app.wsgi_app = CompressionMiddleware(app.wsgi_app, min_size=app.config['COMPRESS_MIN_BYTES'],
+                                         cache_bytes=app.config['COMPRESS_CACHE_BYTES'])
+
+    with app.app_context():
+        inspector.attach(db.engine)
+        sqlite_pragmas = SQLITE_PROFILES[app.config['SQLITE_PROFILE']]
+        if sqlite_pragmas and db.engine.dialect.name == 'sqlite':
+            event.listen(db.engine, 'connect',
+                         lambda dbapi_connection, connection_record: apply_sqlite_pragmas(dbapi_connection,
+                                                                                          sqlite_pragmas))
+        if app.config['BUILD_ASSETS_ON_STARTUP']:
+            try:
+                build_bundles()
+            except OSError as e:  # read-only deploys ship prebuilt bundles
+                app.logger.warning('could not rebuild asset bundles: %s', e)
+
+    if app.config['COMMENT_WRITE_BEHIND']:
+        writer = CommentWriter(partial(write_comment_batch, app), os.path.join(app.instance_path, 'comment-journal'),
+                               max_queue=app.config['COMMENT_QUEUE_SIZE'],
+                               batch_rows=app.config['COMMENT_BATCH_ROWS'],
+                               flush_interval=app.config['COMMENT_FLUSH_MS'] / 1000,
+                               fsync=app.config['COMMENT_JOURNAL_FSYNC'])
+        app.extensions['comment_writer'] = writer
+        writer.start()
+    return app
 
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    create_app().run(debug=True)
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import re
+import threading
+
+from werkzeug.security import safe_join
+
+
+class AssetManifest:
+    """ Maps files under the static folder to short content hashes, persisted as JSON. Each entry remembers the
+    file's size and mtime, so a file replaced behind our back (or by another worker) is re-hashed on next use. """
+
+    def __init__(self, static_folder, manifest_path, mounts=None):
+        self.static_folder = static_folder
+        self.manifest_path = manifest_path
+        # first path segment -> folder that stands in for it, e.g. {'images': upload folder kept elsewhere}
+        self.mounts = mounts or {}
+        self._lock = threading.Lock()
+        try:
+            with open(manifest_path, encoding='utf-8') as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError):
+            self._entries = {}
+
+    def locate(self, path):
+        """ (folder, path within it) of the file served as static/path """
+        top, _, rest = path.partition('/')
+        if rest and top in self.mounts:
+            return self.mounts[top], rest
+        return self.static_folder, path
+
+    def digest(self, path):
+        """ Content hash of static/path, or None if the file does not exist """
+        full_path = safe_join(*self.locate(path))
+        if full_path is None:
+            return None
+        try:
+            stat = os.stat(full_path)
+        except OSError:
+            return None
+        entry = self._entries.get(path)
+        if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns:
+            return entry['digest']
+        return self.update(path)
+
+    def update(self, *paths):
+        digest = None
+        with self._lock:
+            for path in paths:
+                full_path = safe_join(*self.locate(path))
+                if full_path is None or not os.path.isfile(full_path):
+                    self._entries.pop(path, None)
+                    continue
+                stat = os.stat(full_path)
+                digest = file_digest(full_path)
+                self._entries[path] = {'digest': digest, 'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+            self._save()
+        return digest
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        tmp_path = f'{self.manifest_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._entries, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+
+# bundle (relative to the static folder) -> its sources, concatenated in this order
+BUNDLES = {
+    'dist/app.css': ('styles.css', 'css/pages.css'),
+    'dist/app.js': ('js/app.js',),
+}
+
+
+def bundle_stale(static_folder, bundle, sources):
+    try:
+        built = os.stat(os.path.join(static_folder, bundle)).st_mtime_ns
+    except OSError:
+        return True
+    return any(os.stat(os.path.join(static_folder, source)).st_mtime_ns > built for source in sources)
+
+
+def build_bundle(static_folder, bundle, sources):
+    """ Concatenate and minify sources into static_folder/bundle; returns True if its contents changed """
+    minify = minify_css if bundle.endswith('.css') else minify_js
+    parts = []
+    for source in sources:
+        with open(os.path.join(static_folder, source), encoding='utf-8') as f:
+            parts.append(minify(f.read()))
+    content = '\n'.join(parts) + '\n'
+    path = os.path.join(static_folder, bundle)
+    try:
+        with open(path, encoding='utf-8') as f:
+            if f.read() == content:
+                os.utime(path)
+                return False
+    except OSError:
+        pass
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+    return True
+
+
+def minify_css(text):
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.S)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s*([{};:,>])\s*', r'\1', text)
+    return text.replace(';}', '}').strip()
+
+
+def minify_js(text):
+    """ Conservative: drops whole-line comments, indentation and blank lines, never touching code inside a line """
+    lines = (line.strip() for line in text.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//'))
+
+
+def file_digest(path, length=16):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            sha.update(chunk)
+    return sha.hexdigest()[:length]
@@ -0,0 +1,148 @@
+""" Latency and throughput of every user-facing route, driven in-process through the Flask test client at fixed
+concurrency levels against a seeded copy of instance/mygames.db. Prints p50/p95/p99 latency and requests per
+second per route and concurrency as JSON, and exits with status 1 if any result regressed past the baseline
+by more than --tolerance.
+
+    python benchmarks/routes.py --save-baseline      # record benchmarks/baseline.json on the reference machine
+    python benchmarks/routes.py                      # compare against it
+
+Baselines only compare on the machine (and load) they were recorded on.
+"""
+import argparse
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import create_app, db  # noqa: E402
+from seed_data import SyntheticCatalog, seed_catalog  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+
+
+def route_requests(game_ids):
+    """ name -> function(client, n) that makes the nth request of that route and returns the response """
+    def game(n):
+        return game_ids[n * 7919 % len(game_ids)]
+
+    return {
+        'index': lambda client, n: client.get('/'),
+        'game_page': lambda client, n: client.get(f'/game/{game(n)}'),
+        'add_comment': lambda client, n: client.post(f'/game/{game(n)}/add_comment',
+                                                     data={'name': f'bench{n}', 'comment': 'Benchmark comment.'}),
+        'admin': lambda client, n: client.get('/admin'),
+        'display_image': lambda client, n: client.get('/display_image/default.jpg'),
+    }
+
+
+def percentile(ordered, fraction):
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def run_level(app, send, concurrency, requests):
+    """ requests calls of send spread over concurrency threads, each with its own logged-in client """
+    clients = []
+    for _ in range(concurrency):
+        client = app.test_client()
+        client.post('/login', data={'username': 'admin', 'password': 'password123'})
+        clients.append(client)
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def worker(client, numbers):
+        for n in numbers:
+            started = time.perf_counter()
+            response = send(client, n)
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                if response.status_code >= 400:
+                    errors.append(response.status_code)
+
+    threads = [threading.Thread(target=worker, args=(client, range(i, requests, concurrency)))
+               for i, client in enumerate(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {'requests': requests, 'errors': len(errors),
+            'requests_per_second': round(requests / wall, 1),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 2)}
+
+
+def regressions(results, baseline, tolerance):
+    """ Messages for every result more than tolerance slower (p95) or lower-throughput than its baseline """
+    found = []
+    for route, levels in results.items():
+        for concurrency, result in levels.items():
+            expected = baseline.get(route, {}).get(concurrency)
+            if expected is None:
+                continue
+            if result['p95_ms'] > expected['p95_ms'] * (1 + tolerance):
+                found.append(f"{route} x{concurrency}: p95 {result['p95_ms']} ms vs baseline {expected['p95_ms']} ms")
+            if result['requests_per_second'] < expected['requests_per_second'] * (1 - tolerance):
+                found.append(f"{route} x{concurrency}: {result['requests_per_second']} req/s vs baseline "
+                             f"{expected['requests_per_second']} req/s")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--requests', type=int, default=500, help='Requests per route and concurrency level.')
+    parser.add_argument('--routes', nargs='+', help='Defaults to every route.')
+    parser.add_argument('--games', type=int, default=500, help='Games to seed.')
+    parser.add_argument('--comments', type=int, default=50000, help='Comments to seed.')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='Write the results to --baseline.')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed fractional p95 increase or throughput drop before failing.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        shutil.copyfile(os.path.join(ROOT, 'instance', 'mygames.db'), path)
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}', 'SECRET_KEY': 'benchmark',
+                          'RATE_LIMITS': {}, 'BUILD_ASSETS_ON_STARTUP': False})
+        with app.app_context():
+            game_ids = seed_catalog(SyntheticCatalog(), args.games, args.comments)
+        routes = route_requests(game_ids)
+
+        results = {}
+        for route in args.routes or list(routes):
+            results[route] = {str(concurrency): run_level(app, routes[route], concurrency, args.requests)
+                              for concurrency in args.concurrency}
+        with app.app_context():
+            db.engine.dispose()
+    print(json.dumps(results, indent=2))
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+        return
+    if not os.path.exists(args.baseline):
+        print(f'no baseline at {args.baseline}; record one with --save-baseline', file=sys.stderr)
+        return
+    with open(args.baseline, encoding='utf-8') as f:
+        found = regressions(results, json.load(f), args.tolerance)
+    for message in found:
+        print(f'REGRESSION {message}', file=sys.stderr)
+    sys.exit(1 if found else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+""" Startup time and throughput of the development server (python app.py) against the production entry point
+(gunicorn wsgi:application), each serving its own copy of instance/mygames.db.
+
+    python benchmarks/server_entrypoints.py --clients 16 --seconds 10 --workers 4 --threads 4
+"""
+import argparse
+import http.client
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PATHS = ['/', '/game/1', '/game/2', '/api/games', '/game/1/comments']
+
+
+def start_server(command, env, port, startup_timeout=60):
+    """ Launch a server in its own process group; returns (process, seconds until '/' first answered 200) """
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                               start_new_session=True)
+    while time.perf_counter() - started < startup_timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f'{command[0]} exited with {process.returncode}')
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/')
+            if connection.getresponse().status == 200:
+                return process, time.perf_counter() - started
+        except OSError:
+            time.sleep(0.05)
+    stop_server(process)
+    raise RuntimeError(f'{command[0]} did not answer within {startup_timeout}s')
+
+
+def stop_server(process):
+    # the dev server's reloader runs the app in a child process; take down the whole group
+    os.killpg(process.pid, signal.SIGTERM)
+    process.wait()
+
+
+def measure_throughput(port, clients, seconds):
+    stop = threading.Event()
+    counts = {'requests': 0, 'errors': 0}
+    latencies = []
+    lock = threading.Lock()
+
+    def client(n):
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        i = n
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                connection.request('GET', PATHS[i % len(PATHS)])
+                response = connection.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+                ok = False
+            elapsed = time.perf_counter() - started
+            with lock:
+                counts['requests' if ok else 'errors'] += 1
+                latencies.append(elapsed)
+            i += 1
+        connection.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    return dict(counts, requests_per_second=round(counts['requests'] / seconds, 1),
+                p50_ms=round(latencies[len(latencies) // 2] * 1000, 2) if latencies else None,
+                p95_ms=round(latencies[int(len(latencies) * 0.95)] * 1000, 2) if latencies else None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--port', type=int, default=8000, help='Port for gunicorn; the dev server always uses 5000.')
+    args = parser.parse_args()
+
+    servers = [
+        ('dev', [sys.executable, 'app.py'], 5000, {}),
+        ('gunicorn', [sys.executable, '-m', 'gunicorn', 'wsgi:application'], args.port,
+         {'BIND': f'127.0.0.1:{args.port}', 'WEB_CONCURRENCY': str(args.workers),
+          'GUNICORN_THREADS': str(args.threads)}),
+    ]
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, command, port, extra_env in servers:
+            path = os.path.join(tmp, f'{name}.db')
+            shutil.copyfile(os.path.join(ROOT, 'instance', 'mygames.db'), path)
+            env = dict(os.environ, DATABASE_URL=f'sqlite:///{path}', **extra_env)
+            process, startup = start_server(command, env, port)
+            try:
+                results.append(dict(measure_throughput(port, args.clients, args.seconds), server=name,
+                                    startup_seconds=round(startup, 2)))
+            finally:
+                stop_server(process)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+""" Read throughput of the homepage/game page queries, and write throughput of the threads that keep posting
+comments meanwhile, once per SQLite engine profile from app.SQLITE_PROFILES. Compare both numbers: a profile
+that lets more writes through leaves the readers less of the CPU.
+
+    python benchmarks/sqlite_profile.py --readers 8 --writers 2 --seconds 10
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine, event, insert, select, tuple_
+from sqlalchemy.exc import OperationalError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import SQLITE_PROFILES, apply_sqlite_pragmas, db, Game, Comments  # noqa: E402
+
+
+def build_database(path, games, comments_per_game):
+    engine = create_engine(f'sqlite:///{path}')
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(insert(Game), [
+            {'id': i, 'gamename': f'Game {i}', 'gamepicture': 'default.jpg', 'description': 'x' * 800,
+             'developer': 'Developer', 'publisher': 'Publisher', 'releasedate': '2020-01-01', 'position': i}
+            for i in range(1, games + 1)])
+        connection.execute(insert(Comments), [
+            {'commentatorsname': f'user{i}', 'comment': 'c' * 200, 'game_id': i % games + 1,
+             'timestamp': datetime.utcnow()}
+            for i in range(games * comments_per_game)])
+    engine.dispose()
+
+
+def run_profile(path, profile, readers, writers, seconds, games):
+    engine = create_engine(f'sqlite:///{path}', pool_size=readers + writers, max_overflow=0)
+    pragmas = SQLITE_PROFILES[profile]
+    if pragmas:
+        event.listen(engine, 'connect', lambda connection, record: apply_sqlite_pragmas(connection, pragmas))
+
+    stop = threading.Event()
+    counts = {'reads': 0, 'writes': 0, 'read_errors': 0, 'write_errors': 0}
+    lock = threading.Lock()
+
+    def bump(name):
+        with lock:
+            counts[name] += 1
+
+    def reader(n):
+        game_id = n % games + 1
+        while not stop.is_set():
+            try:
+                with engine.connect() as connection:
+                    connection.execute(select(Game.id, Game.gamename, Game.gamepicture, Game.position)
+                                       .order_by(Game.id).limit(25)).all()
+                    connection.execute(select(Comments).where(Comments.game_id == game_id)
+                                       .where(tuple_(Comments.timestamp, Comments.commentid) < (datetime.utcnow(), 0))
+                                       .order_by(Comments.timestamp.desc(), Comments.commentid.desc())
+                                       .limit(21)).all()
+                bump('reads')
+            except OperationalError:
+                bump('read_errors')
+
+    def writer(n):
+        while not stop.is_set():
+            try:
+                with engine.begin() as connection:
+                    connection.execute(insert(Comments).values(commentatorsname=f'writer{n}', comment='w' * 200,
+                                                               game_id=n % games + 1,
+                                                               timestamp=datetime.utcnow()))
+                bump('writes')
+            except OperationalError:
+                bump('write_errors')
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads += [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+
+    return dict(counts, profile=profile, reads_per_second=round(counts['reads'] / seconds, 1),
+                writes_per_second=round(counts['writes'] / seconds, 1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--comments-per-game', type=int, default=200)
+    parser.add_argument('--profiles', nargs='+', default=list(SQLITE_PROFILES))
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for profile in args.profiles:
+            path = os.path.join(tmp, f'{profile}.db')
+            build_database(path, args.games, args.comments_per_game)
+            results.append(run_profile(path, profile, args.readers, args.writers, args.seconds, args.games))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
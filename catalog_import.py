@@ -0,0 +1,145 @@
+import csv
+import io
+import json
+
+from flask import current_app
+from sqlalchemy.exc import DBAPIError
+
+from extensions import begin_immediate, db, page_cache, query_inspector
+from models import Game
+
+# same limits the admin form enforces (README 2.4.5); releasedate is bounded by its column
+GAME_FIELD_LIMITS = {'gamename': 100, 'description': 800, 'developer': 100, 'publisher': 100, 'releasedate': 100}
+OPTIONAL_FIELDS = {'gamepicture': 150}
+
+
+class UnreadableFile(Exception):
+    pass
+
+
+class ImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.errors = []
+        # set when the file as a whole could not be read; nothing from it is imported then
+        self.file_error = None
+
+    def error(self, line, message):
+        self.errors.append((line, message))
+
+    def fail(self, message):
+        self.file_error = message
+        self.inserted = 0
+
+    def summary(self):
+        if self.file_error:
+            return f'Nothing imported: {self.file_error}'
+        return f'{self.inserted} games imported, {len(self.errors)} rows rejected'
+
+
+def detect_format(filename):
+    return 'ndjson' if filename.lower().endswith(('.ndjson', '.jsonl')) else 'csv'
+
+
+def read_rows(stream, fmt):
+    """ Yield (line number, dict or None, error) from a binary CSV/NDJSON stream, one record at a time. Raises
+    UnreadableFile if the stream is not UTF-8 text or not CSV at all. """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        yield from _parse(text, fmt)
+    except UnicodeDecodeError as e:
+        raise UnreadableFile(f'the file is not UTF-8 text ({e.reason})') from e
+    except csv.Error as e:
+        raise UnreadableFile(f'the file is not valid CSV ({e})') from e
+
+
+def _parse(text, fmt):
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row, None
+    else:
+        for number, line in enumerate(text, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield number, None, f'invalid JSON: {e}'
+                continue
+            if not isinstance(row, dict):
+                yield number, None, 'expected a JSON object'
+                continue
+            yield number, row, None
+
+
+def validate_row(row):
+    """ Game column values for a raw record, or raise ValueError describing the first problem """
+    values = {}
+    for field, limit in GAME_FIELD_LIMITS.items():
+        value = str(row.get(field) or '').strip()
+        if not value:
+            raise ValueError(f'{field} is required')
+        if len(value) > limit:
+            raise ValueError(f'{field} exceeds {limit} characters')
+        values[field] = value
+    for field, limit in OPTIONAL_FIELDS.items():
+        value = str(row.get(field) or '').strip()
+        if len(value) > limit:
+            raise ValueError(f'{field} exceeds {limit} characters')
+        values[field] = value or None
+    values['gamepicture'] = values['gamepicture'] or 'default.jpg'
+    return values
+
+
+def import_games(stream, fmt, batch_size=None):
+    """ Insert every valid record of a CSV/NDJSON stream in one transaction, batch_size rows per executemany.
+    Invalid records, and rows the database refuses, are reported instead of aborting the load; a file that
+    cannot be read at all imports nothing and sets report.file_error. """
+    batch_size = batch_size or current_app.config['IMPORT_BATCH_SIZE']
+    report = ImportReport()
+    begin_immediate()
+    position = db.session.scalar(db.select(db.func.coalesce(db.func.max(Game.position), 0)))
+    batch = []
+
+    def insert_batch():
+        nonlocal position
+        try:
+            with db.session.begin_nested():
+                db.session.execute(db.insert(Game), [dict(values, position=position + offset)
+                                                     for offset, (line, values) in enumerate(batch, 1)])
+            position += len(batch)
+            report.inserted += len(batch)
+        except DBAPIError:
+            # isolate the rows the database refused
+            with query_inspector.expect_repeats():
+                for line, values in batch:
+                    try:
+                        with db.session.begin_nested():
+                            db.session.execute(db.insert(Game), [dict(values, position=position + 1)])
+                        position += 1
+                        report.inserted += 1
+                    except DBAPIError as e:
+                        report.error(line, str(e.orig))
+        batch.clear()
+
+    try:
+        for line, row, error in read_rows(stream, fmt):
+            if error is None:
+                try:
+                    batch.append((line, validate_row(row)))
+                except ValueError as e:
+                    error = str(e)
+            if error is not None:
+                report.error(line, error)
+            if len(batch) >= batch_size:
+                insert_batch()
+    except UnreadableFile as e:
+        db.session.rollback()
+        report.fail(str(e))
+        return report
+    if batch:
+        insert_batch()
+    db.session.commit()
+    page_cache.invalidate('catalog')
+    return report
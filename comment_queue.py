@@ -0,0 +1,203 @@
+import atexit
+import glob
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+_STOP = object()
+
+
+class QueueFull(Exception):
+    pass
+
+
+class CommentWriter:
+    """ Write-behind queue for new comments. Submitted comments are appended to a per-process journal, then a
+    background thread hands them to write_batch in groups of up to batch_rows, or whatever arrived within
+    flush_interval seconds, so one transaction (and one fsync) covers the whole group.
+
+    write_batch(comments, replay) must insert the comments in a single transaction. With replay=True it must skip
+    comments that are already stored: a crash between that commit and the journal checkpoint replays them. """
+
+    def __init__(self, write_batch, journal_dir, max_queue=10000, batch_rows=200, flush_interval=0.05,
+                 fsync=False, retry_delay=0.1, max_retry_delay=60):
+        self.write_batch = write_batch
+        self.journal_dir = journal_dir
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.journal_path = os.path.join(journal_dir, f'comment-journal-{os.getpid()}.ndjson')
+        self._queue = queue.Queue(max_queue)
+        self._lock = threading.Lock()
+        self._seq = 0
+        # every seq up to _committed is stored; _uncommitted holds the journaled seqs above it not yet stored
+        self._committed = 0
+        self._uncommitted = set()
+        # batches that failed every attempt, retried once _retry_at passes
+        self._failed = []
+        self._retry_at = None
+        self._backoff = retry_delay
+        self._journal = None
+        self._thread = None
+
+    def start(self):
+        os.makedirs(self.journal_dir, exist_ok=True)
+        self.replay_orphans()
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+        self._thread = threading.Thread(target=self._run, name='comment-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def submit(self, comment):
+        """ Journal and enqueue a comment dict (JSON-serialisable); raises QueueFull when the queue is at capacity """
+        with self._lock:
+            if self._queue.full():
+                raise QueueFull()
+            self._seq += 1
+            self._uncommitted.add(self._seq)
+            self._journal.write(json.dumps(dict(comment, seq=self._seq)) + '\n')
+            self._journal.flush()
+            if self.fsync:
+                os.fsync(self._journal.fileno())
+            self._queue.put_nowait(dict(comment, seq=self._seq))
+
+    def stop(self):
+        """ Flush everything queued so far and stop the writer thread """
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+        self._journal.close()
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            timeout = None if self._retry_at is None else max(0, self._retry_at - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                self._retry_failed()
+                continue
+            if item is _STOP:
+                self._retry_failed()
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            stopping = False
+            while len(batch) < self.batch_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._write(batch)
+            if stopping:
+                self._retry_failed()
+                return
+
+    def _write(self, batch, attempts=5):
+        for attempt in range(attempts):
+            try:
+                self.write_batch(batch, False)
+                break
+            except Exception:
+                logger.exception('comment batch of %d failed (attempt %d)', len(batch), attempt + 1)
+                time.sleep(self.retry_delay * 2 ** attempt)
+        else:
+            # keep it pending: it stays in the journal, uncheckpointed, and is tried again after a growing delay
+            self._failed.append(batch)
+            if self._retry_at is None:
+                self._retry_at = time.monotonic() + self._backoff
+            logger.error('%d comments not written; retrying in %.1fs', len(batch), self._backoff)
+            return False
+        self._checkpoint(batch)
+        return True
+
+    def _retry_failed(self):
+        failed, self._failed, self._retry_at = self._failed, [], None
+        for batch in failed:
+            if not self._write(batch, attempts=1):
+                self._failed.extend(failed[failed.index(batch) + 1:])
+                self._backoff = min(self._backoff * 2, self.max_retry_delay)
+                self._retry_at = time.monotonic() + self._backoff
+                return
+        self._backoff = self.retry_delay
+
+    def _checkpoint(self, batch):
+        with self._lock:
+            self._uncommitted.difference_update(entry['seq'] for entry in batch)
+            if not self._uncommitted:
+                # nothing in flight or failed: start the journal over instead of letting it grow forever
+                self._committed = self._seq
+                self._journal.seek(0)
+                self._journal.truncate()
+                return
+            # only advance past seqs that are all stored; later ones already stored are skipped on replay
+            committed = min(self._uncommitted) - 1
+            if committed > self._committed:
+                self._committed = committed
+                self._journal.write(json.dumps({'committed': committed}) + '\n')
+                self._journal.flush()
+
+    def replay_orphans(self):
+        """ Write out comments left in the journals of processes that are gone """
+        for path in glob.glob(os.path.join(self.journal_dir, 'comment-journal-*.ndjson')):
+            pid = int(path.rsplit('-', 1)[1].split('.')[0])
+            if pid != os.getpid() and process_alive(pid):
+                continue
+            claimed = f'{path}.replaying-{os.getpid()}'
+            try:
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                continue  # another worker got it first
+            pending = read_journal(claimed)
+            try:
+                for start in range(0, len(pending), self.batch_rows):
+                    self.write_batch(pending[start:start + self.batch_rows], True)
+            except Exception:
+                # hand it back under its dead owner's name so the next start tries again
+                logger.exception('replaying %s failed; leaving it for the next start', path)
+                os.rename(claimed, path)
+                continue
+            logger.info('replayed %d journaled comments from %s', len(pending), path)
+            os.remove(claimed)
+
+
+def read_journal(path):
+    entries, committed = [], 0
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break  # torn final write
+            if 'committed' in record:
+                committed = max(committed, record['committed'])
+            else:
+                entries.append(record)
+    return [entry for entry in entries if entry['seq'] > committed]
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
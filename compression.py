@@ -0,0 +1,200 @@
+import hashlib
+import zlib
+
+from page_cache import PageCache
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; without it every client that accepts gzip gets gzip
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('text/html', 'text/css', 'text/plain', 'text/javascript', 'application/javascript',
+                      'application/json', 'image/svg+xml')
+
+
+class CompressionMiddleware:
+    """ WSGI middleware that gzip- or brotli-encodes text responses for clients that accept it.
+
+    Bodies smaller than min_size, other content types (the JPEGs from display_image among them) and responses that
+    are already encoded pass through untouched. Bodies are compressed chunk by chunk as the application yields them.
+    Fully rendered bodies up to max_cached_body bytes are also cached by content hash, so the same page served again
+    (typically straight from the page cache) is not compressed again. """
+
+    def __init__(self, app, min_size=1024, gzip_level=6, brotli_quality=5, cache_bytes=16 * 1024 * 1024,
+                 max_cached_body=1024 * 1024):
+        self.app = app
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.max_cached_body = max_cached_body
+        self.cache = PageCache(cache_bytes)
+
+    def __call__(self, environ, start_response):
+        encoding = negotiate(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None or environ.get('REQUEST_METHOD') == 'HEAD':
+            return self.app(environ, start_response)
+
+        response = {}
+
+        def capture(status, headers, exc_info=None):
+            if exc_info and response.get('started'):
+                raise exc_info[1].with_traceback(exc_info[2])
+            # the real start_response is called once we know whether the body gets compressed
+            response['status'], response['headers'] = status, headers
+            return write_unsupported
+
+        app_iter = self.app(environ, capture)
+        return self._respond(app_iter, response, encoding, start_response)
+
+    def _respond(self, app_iter, response, encoding, start_response):
+        try:
+            chunks = iter(app_iter)
+            first = next(chunks, b'')  # lets the application call start_response
+            status, headers = response['status'], response['headers']
+            length = header(headers, 'Content-Length')
+            if not self._compressible(status, headers):
+                response['started'] = True
+                start_response(status, headers)
+                yield first
+                yield from chunks
+                return
+
+            vary(headers)
+            if length is not None and int(length) <= self.max_cached_body:
+                body = first + b''.join(chunks)
+                if len(body) < self.min_size:
+                    response['started'] = True
+                    start_response(status, headers)
+                    yield body
+                    return
+                compressed = self._cached(encoding, body)
+                response['started'] = True
+                start_response(status, encoded_headers(headers, encoding, len(compressed)))
+                yield compressed
+                return
+
+            # unknown or large length: hold chunks back only until min_size is reached, then stream
+            pending, size = [first], len(first)
+            for chunk in chunks:
+                pending.append(chunk)
+                size += len(chunk)
+                if size >= self.min_size:
+                    break
+            else:
+                response['started'] = True
+                start_response(status, headers)
+                yield b''.join(pending)
+                return
+            compressor = self._compressor(encoding)
+            response['started'] = True
+            start_response(status, encoded_headers(headers, encoding))
+            for chunk in pending:
+                out = compressor.compress(chunk)
+                if out:
+                    yield out
+            for chunk in chunks:
+                out = compressor.compress(chunk)
+                if out:
+                    yield out
+            yield compressor.flush()
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+
+    def _compressible(self, status, headers):
+        if not status.startswith('200'):
+            return False
+        if header(headers, 'Content-Encoding') or 'no-transform' in (header(headers, 'Cache-Control') or ''):
+            return False
+        content_type = (header(headers, 'Content-Type') or '').split(';')[0].strip().lower()
+        return content_type in COMPRESSIBLE_TYPES
+
+    def _cached(self, encoding, body):
+        key = (encoding, hashlib.blake2b(body, digest_size=16).digest())
+        entry = self.cache.get(key)
+        if entry is not None:
+            return entry[0]
+        compressor = self._compressor(encoding)
+        compressed = compressor.compress(body) + compressor.flush()
+        self.cache.set(key, compressed)
+        return compressed
+
+    def _compressor(self, encoding):
+        if encoding == 'br':
+            return BrotliCompressor(self.brotli_quality)
+        return zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)
+
+
+class BrotliCompressor:
+    """ brotli.Compressor behind zlib's compress()/flush() interface """
+
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.finish()
+
+
+def write_unsupported(data):
+    raise RuntimeError('the legacy write() callable is not supported behind CompressionMiddleware')
+
+
+def negotiate(accept_encoding):
+    """ 'br' or 'gzip', whichever an Accept-Encoding header value rates higher (br on a tie), or None if it
+    accepts neither """
+    accepted = {}
+    for part in accept_encoding.lower().split(','):
+        name, *params = [piece.strip() for piece in part.split(';')]
+        quality = 1.0
+        for param in params:
+            if param.startswith('q='):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if name:
+            accepted[name] = quality
+    wildcard = accepted.get('*', 0.0)
+    best, best_quality = None, 0.0
+    for encoding in ('br', 'gzip') if brotli is not None else ('gzip',):
+        quality = accepted.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def header(headers, name):
+    name = name.lower()
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def vary(headers):
+    for i, (key, value) in enumerate(headers):
+        if key.lower() == 'vary':
+            if 'accept-encoding' not in value.lower():
+                headers[i] = (key, f'{value}, Accept-Encoding')
+            return
+    headers.append(('Vary', 'Accept-Encoding'))
+
+
+def encoded_headers(headers, encoding, length=None):
+    """ headers for the encoded body: new Content-Encoding/Length, and a weak ETag since the bytes differ from the
+    identity response's """
+    result = []
+    for key, value in headers:
+        lower = key.lower()
+        if lower == 'content-length':
+            continue
+        if lower == 'etag' and not value.startswith('W/'):
+            value = 'W/' + value
+        result.append((key, value))
+    result.append(('Content-Encoding', encoding))
+    if length is not None:
+        result.append(('Content-Length', str(length)))
+    return result
@@ -1,26 +1,67 @@
 import os
 import time
+import atexit
+import queue
 import random
+import shutil
+import sqlite3
 import string
+import tempfile
+import threading
 import pytest
 import emoji
 from selenium.webdriver import ActionChains
 from datetime import datetime
+from flask_migrate import upgrade
 from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.common.by import By
-from app import app, db
-from app import Game
+from werkzeug.serving import make_server
+from app import Game, create_app, db
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.wait import WebDriverWait
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
 
-chrome_options = Options()
-chrome_options.add_experimental_option("detach", True)
-service = Service(ChromeDriverManager().install())
-
-base_url = "http://127.0.0.1:5000"
+# pytest-xdist runs every worker (gw0, gw1, ...) in its own process; each one serves its own app and database on
+# its own port, with its own upload folder and instance folder (secret key, asset manifest) in WORKER_DIR. Only
+# tests that use a browser start the server. Set BASE_URL to test an already running server (and its instance/mygames.db) instead.
+ROOT = os.path.dirname(os.path.abspath(__file__))
+WORKER = os.environ.get("PYTEST_XDIST_WORKER", "gw0")
+EXTERNAL_SERVER = os.environ.get("BASE_URL")
+WORKER_DIR = tempfile.mkdtemp(prefix=f"games-{WORKER}-")
+atexit.register(shutil.rmtree, WORKER_DIR, True)
+TEMPLATE_DB = os.path.join(WORKER_DIR, "template.db")
+
+
+def copy_database(source, target):
+    """ Copy an SQLite database page by page with the backup API; source and target are paths or open sqlite3
+    connections. Unlike a file copy this is consistent while the database is in use, WAL included. """
+    opened = []
+    if isinstance(source, str):
+        source = sqlite3.connect(source)
+        opened.append(source)
+    if isinstance(target, str):
+        target = sqlite3.connect(target)
+        opened.append(target)
+    try:
+        source.backup(target)
+    finally:
+        for connection in opened:
+            connection.close()
+
+
+if EXTERNAL_SERVER:
+    app = create_app()
+    base_url = EXTERNAL_SERVER.rstrip("/")
+else:
+    copy_database(os.path.join(ROOT, "instance", "mygames.db"), os.path.join(WORKER_DIR, "mygames.db"))
+    shutil.copytree(os.path.join(ROOT, "static", "images"), os.path.join(WORKER_DIR, "images"))
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(WORKER_DIR, 'mygames.db')}",
+                      "UPLOAD_FOLDER": os.path.join(WORKER_DIR, "images"),
+                      "TESTING": True, "RATE_LIMITS": {}, "BUILD_ASSETS_ON_STARTUP": False},
+                     instance_path=os.path.join(WORKER_DIR, "instance"))
+    base_url = f"http://127.0.0.1:{int(os.environ.get('LIVE_SERVER_PORT', 5000)) + int(WORKER[2:])}"
 RESULTS_FILE_PATH = 'test_results.txt'
 
 TEST_CYCLE_DIR = os.path.join(os.getcwd(), "Bugs", f"Test cycle from {datetime.now().strftime('%d-%m-%Y_%H-%M')}")
@@ -29,20 +70,179 @@ os.makedirs(TEST_CYCLE_DIR, exist_ok=True)
 test_case_counter = 1
 
 
+def chrome_service():
+    """ chromedriver from CHROMEDRIVER or the PATH, so the suite runs offline; webdriver-manager (which downloads
+    a driver) is only the last resort """
+    path = os.environ.get("CHROMEDRIVER") or shutil.which("chromedriver")
+    if path:
+        return Service(path)
+    from webdriver_manager.chrome import ChromeDriverManager
+    return Service(ChromeDriverManager().install())
+
+
+def chrome_options():
+    options = Options()
+    if os.environ.get("HEADLESS", "1") != "0":
+        options.add_argument("--headless=new")
+    options.add_argument("--window-size=1920,1080")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--no-sandbox")
+    if os.environ.get("CHROME_BINARY"):
+        options.binary_location = os.environ["CHROME_BINARY"]
+    return options
+
+
+class DriverPool:
+    """ Chrome sessions reused across tests. A released session is reset (cookies, storage, extra windows) before
+    it is handed out again; one that fails to reset is replaced by a fresh browser. """
+
+    def __init__(self, service, options):
+        self.service = service
+        self.options = options
+        self._idle = queue.SimpleQueue()
+        self._all = []
+
+    def acquire(self):
+        try:
+            driver = self._idle.get_nowait()
+        except queue.Empty:
+            driver = webdriver.Chrome(service=self.service, options=self.options)
+            driver.implicitly_wait(2)
+            self._all.append(driver)
+        try:
+            self.reset(driver)
+        except WebDriverException:
+            self.discard(driver)
+            return self.acquire()
+        return driver
+
+    def release(self, driver):
+        self._idle.put(driver)
+
+    def discard(self, driver):
+        self._all.remove(driver)
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass
+
+    def reset(self, driver):
+        for handle in driver.window_handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(driver.window_handles[0])
+        driver.get(base_url)
+        driver.delete_all_cookies()
+        driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+        driver.get(base_url)
+
+    def close(self):
+        for driver in list(self._all):
+            self.discard(driver)
+
+
+@pytest.fixture(scope="session")
+def live_server():
+    """ Serve this worker's app on base_url for the whole session """
+    if EXTERNAL_SERVER:
+        yield base_url
+        return
+    server = make_server("127.0.0.1", int(base_url.rsplit(":", 1)[1]), app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, name=f"live-server-{WORKER}", daemon=True)
+    thread.start()
+    yield base_url
+    server.shutdown()
+    thread.join()
+    with app.app_context():
+        db.engine.dispose()
+
+
+def restore_database(template):
+    """ Overwrite the app's database with the template through one of the app's own pooled connections, so the
+    live server's other connections simply see the new pages, and drop the pages cached from the old data """
+    with app.app_context():
+        db.session.remove()
+        connection = db.engine.raw_connection()
+        try:
+            copy_database(template, connection.driver_connection)
+        finally:
+            connection.close()
+    app.extensions["page_cache"].clear()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def template_database():
+    """ The migrated database every test starts from, built once per worker. Against an external server the
+    tests share its database, which is put back the way it was when the session ends. """
+    with app.app_context():
+        if not EXTERNAL_SERVER:
+            upgrade(directory=os.path.join(ROOT, "migrations"))
+        copy_database(db.engine.url.database, TEMPLATE_DB)
+    yield TEMPLATE_DB
+    if EXTERNAL_SERVER:
+        restore_database(TEMPLATE_DB)
+
+
+@pytest.fixture(scope="function", autouse=True)
+def fresh_database(template_database):
+    """ Give every test its own copy of the template database; restoring a small template takes milliseconds
+    however much earlier tests wrote """
+    if not EXTERNAL_SERVER:
+        restore_database(template_database)
+
+
+@pytest.fixture(scope="session")
+def driver_pool():
+    pool = DriverPool(chrome_service(), chrome_options())
+    yield pool
+    pool.close()
+
+
 @pytest.fixture(scope="function", autouse=True)
 def app_context():
     with app.app_context():
         yield
 
 
+class FakeClock:
+    """ Stands in for time.monotonic; a test moves time on by setting now """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+
+@pytest.fixture
+def admin_client(client):
+    client.post("/login", data={"username": "admin", "password": "password123"})
+    return client
+
+
+@pytest.fixture
+def game_id():
+    """ Id of the first game. The session is closed again, so the test's requests are not answered from it. """
+    game_id = db.session.scalar(db.select(Game.id).order_by(Game.id).limit(1))
+    db.session.remove()
+    return game_id
+
+
 @pytest.fixture(scope="function")
-def driver():
-    driver = webdriver.Chrome(service=service, options=chrome_options)
-    driver.implicitly_wait(2)
-    driver.maximize_window()
-    driver.get(base_url)
+def driver(live_server, driver_pool, fresh_database):
+    driver = driver_pool.acquire()
     yield driver
-    driver.quit()
+    driver_pool.release(driver)
 
 
 @pytest.fixture
@@ -103,8 +303,14 @@ def assertion_handling(driver, request):
     return sa, errors
 
 
+def is_xdist_worker(session):
+    return hasattr(session.config, "workerinput")
+
+
 @pytest.hookimpl(tryfirst=True)
 def pytest_sessionstart(session):
+    if is_xdist_worker(session):
+        return
     with open(RESULTS_FILE_PATH, 'w', encoding='utf-8') as f:
         f.write("=" * 128 + "\n")
         f.write(f"                                            📊📊📊 Test Results 📊📊📊\n")
@@ -118,42 +324,34 @@ def log_results(request):
 
     def log(status, errors=None):
         global test_case_counter
+        # one write per entry, so entries from parallel workers do not interleave
+        lines = []
+        status_emoji = "✔️ ✔️ ✔️ PASSED ✔️ ✔️ ✔️" if status == "passed" else "❌ ❌ ❌ FAILED ❌ ❌ ❌"
+        lines.append(f"\n                             {test_case_counter}.💠💠💠{request.node.nodeid}💠💠💠:\n".upper())
+        test_case_counter += 1
+        if test_description:
+            lines.append(f"{status_emoji}\n        📄📄📄\n        Test case Description:\n        {test_description.strip()}\n        📄📄📄\n")
+        else:
+            lines.append(f"{status_emoji}\n        📄📄📄\n        Test case Description:\n🔴 🔴 🔴 Not provided 🔴 "
+                         f"🔴 🔴\n        📄📄📄\n")
+        if errors:
+            lines.append(f"❗ ❗ ❗ ERRORS LIST ❗ ❗ ❗:\n")
+            for i, error in enumerate(errors, 1):
+                lines.append(f"        ⚠️⚠️⚠️ {i}. {error} ⚠️⚠️⚠️\n")
+            lines.append("\n")
+        else:
+            lines.append("🟢 🟢 🟢 NO ERRORS 🟢 🟢 🟢\n\n")
         with open(RESULTS_FILE_PATH, 'a', encoding='utf-8') as f:
-            status_emoji = "✔️ ✔️ ✔️ PASSED ✔️ ✔️ ✔️" if status == "passed" else "❌ ❌ ❌ FAILED ❌ ❌ ❌"
-            f.write(f"\n                             {test_case_counter}.💠💠💠{request.node.nodeid}💠💠💠:\n".upper())
-            test_case_counter += 1
-            if test_description:
-                f.write(f"{status_emoji}\n        📄📄📄\n        Test case Description:\n        {test_description.strip()}\n        📄📄📄\n")
-            else:
-                f.write(f"{status_emoji}\n        📄📄📄\n        Test case Description:\n🔴 🔴 🔴 Not provided 🔴 "
-                        f"🔴 🔴\n        📄📄📄\n")
-            if errors:
-                f.write(f"❗ ❗ ❗ ERRORS LIST ❗ ❗ ❗:\n")
-                for i, error in enumerate(errors, 1):
-                    f.write(f"        ⚠️⚠️⚠️ {i}. {error} ⚠️⚠️⚠️\n")
-                f.write("\n")
-            else:
-                f.write("🟢 🟢 🟢 NO ERRORS 🟢 🟢 🟢\n\n")
+            f.write("".join(lines))
 
     return log
 
 
 @pytest.hookimpl(trylast=True)
 def pytest_sessionfinish(session, exitstatus):
+    if is_xdist_worker(session):
+        return
     with open(RESULTS_FILE_PATH, 'a', encoding='utf-8') as f:
         f.write("=" * 128 + "\n")
         f.write(f"                                          🚩🚩🚩 All tests finished 🚩🚩🚩\n")
         f.write("=" * 128 + "\n")
-
-
-@pytest.fixture(scope="session", autouse=True)
-def final_cleanup():
-    """ Cleanup function to delete all games with ID higher than 8 after all tests have completed """
-    yield
-    with app.app_context():
-        extra_games = Game.query.filter(Game.id > 8).all()
-        for game in extra_games:
-            db.session.delete(game)
-        db.session.commit()
-
-
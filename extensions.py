@@ -0,0 +1,32 @@
+""" The Flask extensions and per-app service handles that app.py and the modules working on its database
+(models, catalog_import, seed_data) share. Nothing here imports app, so any of them can import this. """
+from flask import current_app
+from flask_migrate import Migrate
+from flask_sqlalchemy import SQLAlchemy
+from werkzeug.local import LocalProxy
+
+db = SQLAlchemy()
+migrate = Migrate()
+
+
+def app_service(name):
+    """ Module-level handle on a helper that create_app() builds per app, looked up through current_app """
+    return LocalProxy(lambda: current_app.extensions[name])
+
+
+query_inspector = app_service('query_inspector')
+upload_store = app_service('upload_store')
+page_cache = app_service('page_cache')
+asset_manifest = app_service('asset_manifest')
+request_metrics = app_service('request_metrics')
+# anything with a hit(key) -> seconds-to-wait method can stand in for TokenBucket here
+rate_limiters = app_service('rate_limiters')
+# only built when COMMENT_WRITE_BEHIND is on
+comment_writer = app_service('comment_writer')
+
+
+def begin_immediate():
+    """ Open the session's transaction with BEGIN IMMEDIATE. This takes SQLite's write lock up front and makes
+    SAVEPOINTs nest inside one real transaction (pysqlite would otherwise let the first SAVEPOINT open the
+    transaction, and its RELEASE would commit it). """
+    db.session.connection().exec_driver_sql('BEGIN IMMEDIATE')
@@ -0,0 +1,19 @@
+""" gunicorn settings for wsgi:application, read automatically from the working directory """
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', '127.0.0.1:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+# requests mostly wait on SQLite or the client; a few threads per worker overlap that without more processes
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+# build the app in each worker rather than in the master: SQLite connections and the write-behind thread must not
+# cross a fork
+preload_app = False
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+# recycle workers now and then so slow leaks cannot build up
+max_requests = 10000
+max_requests_jitter = 1000
+accesslog = '-'
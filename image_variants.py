@@ -0,0 +1,105 @@
+import os
+
+try:
+    from PIL import Image, ImageOps, UnidentifiedImageError
+except ImportError:  # Pillow is optional; without it templates keep serving the original pictures
+    Image = None
+
+# (width, height) of every place a game picture is shown. The admin grid reuses the homepage tile size.
+VARIANT_SIZES = {
+    'tile': (240, 280),
+    'page': (300, 400),
+}
+DENSITIES = (1, 2)
+FORMATS = {'webp': ('webp', 'WEBP', {'quality': 80, 'method': 6}),
+           'jpeg': ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True})}
+VARIANTS_DIR = 'variants'
+# extension stored pictures get for each format Pillow detects; other formats get '.' + the format name
+EXTENSIONS = {'JPEG': '.jpg', 'MPO': '.jpg', 'TIFF': '.tif'}
+
+
+class InvalidImage(Exception):
+    pass
+
+
+def variant_filename(filename, variant, density, fmt):
+    stem = os.path.splitext(filename)[0]
+    return f'{VARIANTS_DIR}/{stem}-{variant}@{density}x.{FORMATS[fmt][0]}'
+
+
+def build_variants(image_folder, filename):
+    """ Write every size/density/format variant of image_folder/filename next to it, cropped the same way the
+    templates' object-fit: cover does. Returns the relative paths written; raises InvalidImage (leaving no
+    variants behind) if the file cannot be decoded. """
+    if Image is None:
+        return []
+    os.makedirs(os.path.join(image_folder, VARIANTS_DIR), exist_ok=True)
+    written = []
+    try:
+        with Image.open(os.path.join(image_folder, filename)) as original:
+            original = ImageOps.exif_transpose(original).convert('RGB')
+            for variant, (width, height) in VARIANT_SIZES.items():
+                for density in DENSITIES:
+                    size = (width * density, height * density)
+                    if density > 1 and (original.width < size[0] or original.height < size[1]):
+                        continue
+                    resized = ImageOps.fit(original, size, Image.LANCZOS)
+                    for fmt, (extension, pil_format, options) in FORMATS.items():
+                        path = variant_filename(filename, variant, density, fmt)
+                        resized.save(os.path.join(image_folder, path), pil_format, **options)
+                        written.append(path)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        remove_variants(image_folder, filename)
+        raise InvalidImage(f'{filename}: {e}') from e
+    return written
+
+
+def verify_image(path):
+    """ Raise InvalidImage unless path decodes as a picture Pillow can resize. Returns the extension for the
+    format it decoded as, e.g. '.png'; None without Pillow, which cannot tell. """
+    if Image is None:
+        return None
+    try:
+        with Image.open(path) as image:
+            image.load()
+            fmt = image.format
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise InvalidImage(str(e)) from e
+    return EXTENSIONS.get(fmt, '.' + fmt.lower())
+
+
+def variants_missing(image_folder, filename):
+    """ True if any size lacks its 1x variant, e.g. after a crash between storing a picture and resizing it """
+    if Image is None:
+        return False
+    return not all(os.path.isfile(os.path.join(image_folder, variant_filename(filename, variant, 1, fmt)))
+                   for variant in VARIANT_SIZES for fmt in FORMATS)
+
+
+def picture_sources(image_folder, filename, variant):
+    """ srcset strings (relative to image_folder) of the variants that exist on disk, per format """
+    sources = {}
+    for fmt in FORMATS:
+        candidates = []
+        for density in DENSITIES:
+            path = variant_filename(filename, variant, density, fmt)
+            if os.path.isfile(os.path.join(image_folder, path)):
+                candidates.append((path, f'{density}x'))
+        if candidates:
+            sources[fmt] = candidates
+    return sources
+
+
+def remove_variants(image_folder, filename):
+    """ Delete every variant of filename; returns the relative paths that were removed """
+    removed = []
+    for variant in VARIANT_SIZES:
+        for density in DENSITIES:
+            for fmt in FORMATS:
+                path = variant_filename(filename, variant, density, fmt)
+                try:
+                    os.remove(os.path.join(image_folder, path))
+                    removed.append(path)
+                except FileNotFoundError:
+                    pass
+    return removed
@@ -0,0 +1,125 @@
+import bisect
+import threading
+
+# upper bounds in seconds / bytes; every histogram also has the implicit +Inf bucket
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class _Shard:
+    """ One thread's counters. Only its own thread writes to it, so recording takes no lock. """
+
+    def __init__(self):
+        self.in_flight = 0
+        self.requests = {}    # (endpoint, method, status) -> count
+        self.latency = {}     # (endpoint, method) -> [bucket counts..., sum]
+        self.size = {}        # endpoint -> [bucket counts..., sum]
+
+    def merge(self, other):
+        self.in_flight += other.in_flight
+        for key, count in list(other.requests.items()):
+            self.requests[key] = self.requests.get(key, 0) + count
+        for mine, theirs in ((self.latency, other.latency), (self.size, other.size)):
+            for key, values in list(theirs.items()):
+                totals = mine.setdefault(key, [0] * len(values))
+                for i, value in enumerate(list(values)):
+                    totals[i] += value
+
+
+class RequestMetrics:
+    """ Per-endpoint request counters and latency/response size histograms, rendered in the Prometheus text
+    format. Counters are sharded per thread and only summed when scraped; shards of finished threads are folded
+    into one retired shard so short-lived threads do not pile up. """
+
+    def __init__(self, latency_buckets=LATENCY_BUCKETS, size_buckets=SIZE_BUCKETS):
+        self.latency_buckets = latency_buckets
+        self.size_buckets = size_buckets
+        self._local = threading.local()
+        self._shards = []     # (thread, shard)
+        self._retired = _Shard()
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                self._reap()
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _reap(self):
+        alive = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                self._retired.merge(shard)
+        self._shards = alive
+
+    def started(self):
+        self._shard().in_flight += 1
+
+    def finished(self, endpoint, method, status, seconds, size):
+        shard = self._shard()
+        shard.in_flight -= 1
+        key = (endpoint, method, status)
+        shard.requests[key] = shard.requests.get(key, 0) + 1
+        observe(shard.latency, (endpoint, method), self.latency_buckets, seconds)
+        if size is not None:
+            observe(shard.size, endpoint, self.size_buckets, size)
+
+    def snapshot(self):
+        total = _Shard()
+        with self._lock:
+            self._reap()
+            total.merge(self._retired)
+            for _, shard in self._shards:
+                total.merge(shard)
+        return total
+
+    def render(self, extra=()):
+        """ Prometheus exposition text; extra is an iterable of more (name, type, help, value) samples """
+        total = self.snapshot()
+        lines = ['# HELP http_requests_total Requests handled, by endpoint, method and status.',
+                 '# TYPE http_requests_total counter']
+        for (endpoint, method, status), count in sorted(total.requests.items()):
+            lines.append(f'http_requests_total{labels(endpoint=endpoint, method=method, status=status)} {count}')
+        lines += ['# HELP http_requests_in_flight Requests being handled right now.',
+                  '# TYPE http_requests_in_flight gauge',
+                  f'http_requests_in_flight {total.in_flight}']
+        lines += histogram_lines('http_request_duration_seconds', 'Time to handle a request, by endpoint and method.',
+                                 self.latency_buckets,
+                                 {labels(endpoint=e, method=m): v for (e, m), v in total.latency.items()})
+        lines += histogram_lines('http_response_size_bytes', 'Response body size, by endpoint.', self.size_buckets,
+                                 {labels(endpoint=e): v for e, v in total.size.items()})
+        for name, kind, help_text, value in extra:
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}', f'{name} {value}']
+        return '\n'.join(lines) + '\n'
+
+
+def observe(histograms, key, buckets, value):
+    values = histograms.get(key)
+    if values is None:
+        values = histograms[key] = [0] * (len(buckets) + 2)
+    values[bisect.bisect_left(buckets, value)] += 1
+    values[-1] += value
+
+
+def histogram_lines(name, help_text, buckets, series):
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+    for label_text, values in sorted(series.items()):
+        inner = label_text[1:-1] + ',' if label_text else ''
+        cumulative = 0
+        for bound, count in zip(list(buckets) + ['+Inf'], values):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{inner}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{label_text} {values[-1]:.6f}')
+        lines.append(f'{name}_count{label_text} {cumulative}')
+    return lines
+
+
+def labels(**values):
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for value in values.values())
+    return '{' + ','.join(f'{key}="{value}"' for key, value in zip(values, escaped)) + '}'
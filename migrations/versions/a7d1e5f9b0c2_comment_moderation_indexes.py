@@ -0,0 +1,27 @@
+"""comment moderation indexes
+
+Revision ID: a7d1e5f9b0c2
+Revises: f6c0d4e8a9b1
+Create Date: 2026-10-17 19:02:37.514820
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d1e5f9b0c2'
+down_revision = 'f6c0d4e8a9b1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # plain CREATE INDEX: batch mode would recreate comments and drop its full-text search triggers
+    op.create_index('ix_comments_commentatorsname_timestamp', 'comments', ['commentatorsname', 'timestamp'],
+                    unique=False)
+    op.create_index('ix_comments_timestamp', 'comments', ['timestamp'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_comments_timestamp', table_name='comments')
+    op.drop_index('ix_comments_commentatorsname_timestamp', table_name='comments')
@@ -0,0 +1,55 @@
+"""never reuse the id of a deleted game
+
+Revision ID: b8e2f6a0c3d5
+Revises: a7d1e5f9b0c2
+Create Date: 2026-10-17 20:41:09.217634
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e2f6a0c3d5'
+down_revision = 'a7d1e5f9b0c2'
+branch_labels = None
+depends_on = None
+
+COLUMNS = 'id, gamepicture, gamename, description, developer, publisher, releasedate, position, comment_count, ' \
+          'last_comment_at, version'
+
+
+def recreate_game(autoincrement):
+    """ SQLite can only add AUTOINCREMENT by rebuilding the table. Dropping game drops its index and full-text
+    search triggers, so their DDL is read back first and replayed on the new table. Rows keep their ids, which the
+    comments and game_fts rows refer to; copying them also sets sqlite_sequence to the highest id. """
+    connection = op.get_bind()
+    dependents = connection.execute(sa.text("SELECT sql FROM sqlite_master WHERE tbl_name = 'game' "
+                                            "AND type IN ('index', 'trigger') AND sql IS NOT NULL")).scalars().all()
+    op.create_table('game_rebuilt',
+                    sa.Column('id', sa.Integer(), nullable=False),
+                    sa.Column('gamepicture', sa.String(length=150), nullable=True),
+                    sa.Column('gamename', sa.String(length=100), nullable=False),
+                    sa.Column('description', sa.String(length=800), nullable=False),
+                    sa.Column('developer', sa.String(length=100), nullable=False),
+                    sa.Column('publisher', sa.String(length=100), nullable=False),
+                    sa.Column('releasedate', sa.String(length=100), nullable=False),
+                    sa.Column('position', sa.Integer(), nullable=False),
+                    sa.Column('comment_count', sa.Integer(), server_default='0', nullable=False),
+                    sa.Column('last_comment_at', sa.DateTime(), nullable=True),
+                    sa.Column('version', sa.Integer(), server_default='1', nullable=False),
+                    sa.PrimaryKeyConstraint('id'),
+                    sqlite_autoincrement=autoincrement)
+    op.execute(f'INSERT INTO game_rebuilt ({COLUMNS}) SELECT {COLUMNS} FROM game')
+    op.execute('DROP TABLE game')
+    op.execute('ALTER TABLE game_rebuilt RENAME TO game')
+    for statement in dependents:
+        op.execute(statement)
+
+
+def upgrade():
+    recreate_game(autoincrement=True)
+
+
+def downgrade():
+    recreate_game(autoincrement=False)
@@ -0,0 +1,34 @@
+"""game display position
+
+Revision ID: c7d2e9f0a1b3
+Revises: b3f1c2d4e5a6
+Create Date: 2026-10-17 16:31:47.902114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d2e9f0a1b3'
+down_revision = 'b3f1c2d4e5a6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('game', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('position', sa.Integer(), nullable=True))
+
+    # number the existing catalog 1..n in id order
+    op.execute('UPDATE game SET position = (SELECT COUNT(*) FROM game AS g WHERE g.id <= game.id)')
+
+    with op.batch_alter_table('game', schema=None) as batch_op:
+        batch_op.alter_column('position', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_index(batch_op.f('ix_game_position'), ['position'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('game', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_game_position'))
+        batch_op.drop_column('position')
@@ -0,0 +1,71 @@
+"""full-text search index over games and comments
+
+Revision ID: d4a8b6c1e2f7
+Revises: c7d2e9f0a1b3
+Create Date: 2026-10-17 17:12:38.550912
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4a8b6c1e2f7'
+down_revision = 'c7d2e9f0a1b3'
+branch_labels = None
+depends_on = None
+
+# The FTS tables are external-content indexes over game/comments, kept in sync by the triggers below. The porter
+# stemmer lets "games" find "game" without prefix queries, which are far slower on large indexes. Later
+# migrations must not recreate game or comments (batch "move and copy"), since dropping a table drops its triggers.
+STATEMENTS = [
+    """CREATE VIRTUAL TABLE game_fts USING fts5(
+        gamename, description, developer, publisher,
+        content='game', content_rowid='id', tokenize='porter unicode61 remove_diacritics 2')""",
+    """CREATE VIRTUAL TABLE comment_fts USING fts5(
+        comment,
+        content='comments', content_rowid='commentid', tokenize='porter unicode61 remove_diacritics 2')""",
+    # name matches outrank developer/publisher matches, which outrank the description
+    "INSERT INTO game_fts(game_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0, 3.0, 3.0)')",
+
+    """CREATE TRIGGER game_fts_insert AFTER INSERT ON game BEGIN
+        INSERT INTO game_fts(rowid, gamename, description, developer, publisher)
+        VALUES (new.id, new.gamename, new.description, new.developer, new.publisher);
+    END""",
+    """CREATE TRIGGER game_fts_delete AFTER DELETE ON game BEGIN
+        INSERT INTO game_fts(game_fts, rowid, gamename, description, developer, publisher)
+        VALUES ('delete', old.id, old.gamename, old.description, old.developer, old.publisher);
+    END""",
+    """CREATE TRIGGER game_fts_update AFTER UPDATE OF gamename, description, developer, publisher ON game BEGIN
+        INSERT INTO game_fts(game_fts, rowid, gamename, description, developer, publisher)
+        VALUES ('delete', old.id, old.gamename, old.description, old.developer, old.publisher);
+        INSERT INTO game_fts(rowid, gamename, description, developer, publisher)
+        VALUES (new.id, new.gamename, new.description, new.developer, new.publisher);
+    END""",
+    """CREATE TRIGGER comment_fts_insert AFTER INSERT ON comments BEGIN
+        INSERT INTO comment_fts(rowid, comment) VALUES (new.commentid, new.comment);
+    END""",
+    """CREATE TRIGGER comment_fts_delete AFTER DELETE ON comments BEGIN
+        INSERT INTO comment_fts(comment_fts, rowid, comment) VALUES ('delete', old.commentid, old.comment);
+    END""",
+    """CREATE TRIGGER comment_fts_update AFTER UPDATE OF comment ON comments BEGIN
+        INSERT INTO comment_fts(comment_fts, rowid, comment) VALUES ('delete', old.commentid, old.comment);
+        INSERT INTO comment_fts(rowid, comment) VALUES (new.commentid, new.comment);
+    END""",
+
+    # index whatever is already in the database
+    "INSERT INTO game_fts(game_fts) VALUES ('rebuild')",
+    "INSERT INTO comment_fts(comment_fts) VALUES ('rebuild')",
+]
+
+
+def upgrade():
+    for statement in STATEMENTS:
+        op.execute(statement)
+
+
+def downgrade():
+    for trigger in ('comment_fts_update', 'comment_fts_delete', 'comment_fts_insert',
+                    'game_fts_update', 'game_fts_delete', 'game_fts_insert'):
+        op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    op.execute('DROP TABLE IF EXISTS comment_fts')
+    op.execute('DROP TABLE IF EXISTS game_fts')
@@ -0,0 +1,31 @@
+"""denormalized comment count and last comment time on game
+
+Revision ID: e5b9c3d7f8a2
+Revises: d4a8b6c1e2f7
+Create Date: 2026-10-17 17:48:03.117640
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b9c3d7f8a2'
+down_revision = 'd4a8b6c1e2f7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # plain ALTER TABLE ADD COLUMN: recreating game would drop its full-text search triggers
+    op.add_column('game', sa.Column('comment_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('game', sa.Column('last_comment_at', sa.DateTime(), nullable=True))
+
+    op.execute('UPDATE game SET '
+               'comment_count = (SELECT COUNT(*) FROM comments WHERE comments.game_id = game.id), '
+               'last_comment_at = (SELECT MAX(timestamp) FROM comments WHERE comments.game_id = game.id)')
+
+
+def downgrade():
+    op.execute('ALTER TABLE game DROP COLUMN last_comment_at')
+    op.execute('ALTER TABLE game DROP COLUMN comment_count')
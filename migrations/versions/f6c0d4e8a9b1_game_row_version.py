@@ -0,0 +1,25 @@
+"""game row version for API ETags
+
+Revision ID: f6c0d4e8a9b1
+Revises: e5b9c3d7f8a2
+Create Date: 2026-10-17 18:20:41.068375
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6c0d4e8a9b1'
+down_revision = 'e5b9c3d7f8a2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # plain ALTER TABLE ADD COLUMN: recreating game would drop its full-text search triggers
+    op.add_column('game', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    op.execute('ALTER TABLE game DROP COLUMN version')
@@ -0,0 +1,36 @@
+from datetime import datetime
+
+from extensions import db
+
+
+class Game(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    gamepicture = db.Column(db.String(150))
+    gamename = db.Column(db.String(100), nullable=False)
+    description = db.Column(db.String(800), nullable=False)
+    developer = db.Column(db.String(100), nullable=False)
+    publisher = db.Column(db.String(100), nullable=False)
+    releasedate = db.Column(db.String(100), nullable=False)
+    position = db.Column(db.Integer, nullable=False, index=True)
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    last_comment_at = db.Column(db.DateTime)
+    # bumped by every write that changes what the API returns for this game or its comments
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    comments = db.relationship('Comments', backref='game', cascade="all, delete-orphan", lazy=True)
+
+    # AUTOINCREMENT: a deleted game's id is never handed out again, so its URLs and API ETags cannot start
+    # pointing at a different game
+    __table_args__ = {'sqlite_autoincrement': True}
+
+
+class Comments(db.Model):
+    commentid = db.Column(db.Integer, primary_key=True)
+    commentatorsname = db.Column(db.String(80), nullable=False)
+    comment = db.Column(db.String(800), nullable=False)
+    game_id = db.Column(db.Integer, db.ForeignKey('game.id'), nullable=False)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (db.Index('ix_comments_game_id_timestamp', 'game_id', 'timestamp'),
+                      db.Index('ix_comments_commentatorsname_timestamp', 'commentatorsname', 'timestamp'),
+                      db.Index('ix_comments_timestamp', 'timestamp'))
@@ -0,0 +1,128 @@
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+EXPLAINABLE = re.compile(r'^\s*(SELECT|WITH|UPDATE|DELETE|INSERT)\b', re.IGNORECASE)
+EXPANDED_IN = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+
+
+class RepeatedQuery(Exception):
+    """ Raised in strict mode when one request runs the same statement shape more than the allowed number of times
+    (the usual sign of an N+1 pattern) """
+
+
+class RequestQueries:
+    def __init__(self, repeat_limit, strict):
+        self.repeat_limit = repeat_limit
+        self.strict = strict
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = {}
+        self.flagged = set()
+        self.repeats_expected = 0
+
+
+class QueryInspector:
+    """ Engine event hooks that count queries and DB time for the request in progress on the current thread, log
+    statements slower than slow_seconds with their EXPLAIN QUERY PLAN, and flag statement shapes that repeat more
+    than repeat_limit times within one request. Queries outside begin()/end() are only checked for slowness. """
+
+    def __init__(self, slow_seconds=0.1, repeat_limit=10):
+        self.slow_seconds = slow_seconds
+        self.repeat_limit = repeat_limit
+        self._local = threading.local()
+
+    def attach(self, engine):
+        event.listen(engine, 'before_cursor_execute', self._before)
+        event.listen(engine, 'after_cursor_execute', self._after)
+        event.listen(engine, 'handle_error', self._failed)
+
+    def begin(self, strict=False):
+        self._local.current = RequestQueries(self.repeat_limit, strict)
+
+    def current(self):
+        return getattr(self._local, 'current', None)
+
+    def end(self):
+        """ Stop tracking and return this thread's RequestQueries, or None if begin() was not called """
+        current = self.current()
+        self._local.current = None
+        return current
+
+    @contextmanager
+    def expect_repeats(self):
+        """ Leave statements run inside the block out of the repeat check, for code that loops row by row on purpose """
+        current = self.current()
+        if current is not None:
+            current.repeats_expected += 1
+        try:
+            yield
+        finally:
+            if current is not None:
+                current.repeats_expected -= 1
+
+    @contextmanager
+    def expect_slow(self):
+        """ Leave statements run on this thread inside the block out of the slow query log, for bulk loads whose
+        statements are slow by design """
+        self._local.slow_expected = getattr(self._local, 'slow_expected', 0) + 1
+        try:
+            yield
+        finally:
+            self._local.slow_expected -= 1
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def _failed(self, exception_context):
+        if exception_context.connection is not None:
+            started = exception_context.connection.info.get('query_started')
+            if started:
+                started.pop()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started'].pop()
+        if elapsed >= self.slow_seconds and not getattr(self._local, 'slow_expected', 0):
+            logger.warning('slow query (%.1f ms): %s %r\n%s', elapsed * 1000, statement,
+                           parameters if not executemany else f'[{len(parameters)} rows]',
+                           '' if executemany else explain(cursor, statement, parameters))
+        current = self.current()
+        if current is None:
+            return
+        current.count += 1
+        current.seconds += elapsed
+        if current.repeats_expected:
+            return
+        shape = statement_shape(statement)
+        seen = current.shapes[shape] = current.shapes.get(shape, 0) + 1
+        if seen > current.repeat_limit and shape not in current.flagged:
+            current.flagged.add(shape)
+            message = f'statement ran {seen} times in one request (possible N+1): {shape}'
+            if current.strict:
+                raise RepeatedQuery(message)
+            logger.warning(message)
+
+
+def statement_shape(statement):
+    """ The statement with whitespace collapsed and expanded IN lists folded, so repeats compare equal """
+    return EXPANDED_IN.sub('(?)', ' '.join(statement.split()))
+
+
+def explain(cursor, statement, parameters):
+    if not EXPLAINABLE.match(statement):
+        return ''
+    # a separate cursor: the original one still holds the rows the caller is about to fetch
+    explain_cursor = cursor.connection.cursor()
+    try:
+        explain_cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters)
+        return '\n'.join('    ' + str(row[-1]) for row in explain_cursor.fetchall())
+    except Exception as e:
+        return f'    (no plan: {e})'
+    finally:
+        explain_cursor.close()
@@ -0,0 +1,43 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucket:
+    """ In-memory token buckets, one per key (client IP). Each bucket holds up to burst tokens and refills at
+    refill_per_second; a request takes one token. At most max_keys buckets are tracked: the least recently used
+    one is dropped when a new key arrives, which only ever forgets clients that have been idle the longest. """
+
+    def __init__(self, burst, refill_per_second, max_keys=10000, clock=time.monotonic):
+        self.burst = burst
+        self.refill_per_second = refill_per_second
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key, cost=1):
+        """ Take cost tokens from key's bucket. Returns 0 if allowed, otherwise the seconds until it would be """
+        now = self.clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = self.burst
+                if len(self._buckets) >= self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                tokens, updated = bucket
+                tokens = min(self.burst, tokens + (now - updated) * self.refill_per_second)
+                self._buckets.move_to_end(key)
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                return 0
+            self._buckets[key] = (tokens, now)
+            return (cost - tokens) / self.refill_per_second
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+    def __len__(self):
+        return len(self._buckets)
@@ -0,0 +1,169 @@
+import io
+import math
+import random
+from datetime import datetime, timedelta
+
+from extensions import begin_immediate, db, page_cache, query_inspector
+from models import Comments, Game
+
+try:
+    from PIL import Image, ImageDraw
+except ImportError:  # Pillow is optional; without it seeded games use default.jpg
+    Image = None
+
+WORDS = (
+    'the a of and to in is it that was for on are with as his they be at one have this from or had by hot but '
+    'some what there we can out other were all your when up use word how said an each she which do their time if '
+    'will way about many then them would write like so these her long make thing see him two has look more day '
+    'could go come did my sound no most number who over know water than call first people may down side been now '
+    'find any new work part take get place made live where after back little only round man year came show every '
+    'good me give our under name very through just form much great think say help low line before turn cause same '
+    'mean differ move right boy old too does tell sentence set three want air well also play small end put home '
+    'read hand port large spell add even land here must big high such follow act why ask men change went light '
+    'kind off need house picture try us again animal point mother world near build self earth father game level '
+    'boss quest story combat graphics soundtrack open world sequel remaster patch update loot grind multiplayer '
+    'campaign character ending mission stealth shooter puzzle platformer roguelike survival crafting dialogue'
+).split()
+TITLE_WORDS = (
+    'Shadow Legend Iron Crimson Last Lost Eternal Dark Star Blood Night Dead Silent Broken Hollow Rising Fallen '
+    'Empire Kingdom Chronicles Tales Saga Origins Frontier Protocol Horizon Abyss Echo Vanguard Requiem Odyssey '
+    'Outpost Rebellion Dynasty Ashes Storm Frost Ember Neon Steel Wild Sky Deep Forgotten Sunken Burning Zero'
+).split()
+STUDIOS = (
+    'Studio', 'Games', 'Interactive', 'Entertainment', 'Softworks', 'Digital', 'Labs', 'Workshop', 'Collective',
+)
+FIRST_NAMES = (
+    'Alex Sam Jordan Taylor Casey Riley Morgan Jamie Avery Quinn Dima Olena Ivan Maria Chen Wei Yuki Hana Omar Leila '
+    'Lucas Emma Noah Mia Liam Sofia Mateo Ana Felix Nora Kai Zoe Ravi Priya Tomas Eva Jonas Ines Arjun Sara'
+).split()
+# game descriptions fill most of their 800 characters; comments are mostly short with a long tail
+DESCRIPTION_LENGTH = (450, 0.45, 60, 800)
+COMMENT_LENGTH = (70, 0.9, 2, 800)
+PICTURE_SIZE = (600, 800)
+
+
+class SyntheticCatalog:
+    """ Reproducible fake games and comments: the same seed and arguments always produce the same rows.
+    Comment text is cut from one long pre-generated corpus, which keeps a million comments to a few seconds. """
+
+    def __init__(self, seed=0, skew=1.1, end=datetime(2026, 1, 1), days=365):
+        self.rng = random.Random(seed)
+        self.skew = skew
+        self.end = end
+        self.span = days * 24 * 60 * 60
+        self.corpus = ' '.join(self.rng.choice(WORDS) for _ in range(400000))
+        self.word_starts = [0] + [i + 1 for i, char in enumerate(self.corpus) if char == ' ']
+
+    def text(self, length):
+        start = self.word_starts[self.rng.randrange(len(self.word_starts) - 200)]
+        return self.corpus[start].upper() + self.corpus[start + 1:start + length - 1].rstrip() + '.'
+
+    def length(self, median, sigma, shortest, longest):
+        return min(longest, max(shortest, int(self.rng.lognormvariate(math.log(median), sigma))))
+
+    def game(self, pictures=()):
+        """ Column values for one game, with no id or position """
+        rng = self.rng
+        name = ' '.join(rng.sample(TITLE_WORDS, rng.choice((1, 2, 2, 3, 3, 4))))
+        if rng.random() < 0.3:
+            name += rng.choice((' II', ' III', ' 2', ' Remastered', ': Definitive Edition'))
+        developer = f'{rng.choice(TITLE_WORDS)} {rng.choice(STUDIOS)}'
+        released = datetime(1995, 1, 1) + timedelta(days=rng.randrange(11000))
+        return {'gamename': name[:100], 'description': self.text(self.length(*DESCRIPTION_LENGTH)),
+                'developer': developer, 'publisher': rng.choice((developer, f'{rng.choice(TITLE_WORDS)} Publishing')),
+                'releasedate': released.strftime('%m/%d/%Y'),
+                'gamepicture': rng.choice(pictures) if pictures else 'default.jpg'}
+
+    def comment_games(self, game_ids, count):
+        """ count game ids drawn with Zipf-like weights 1/rank**skew, the popular games picked at random, so a few
+        games collect most of the comments (skew=0 spreads them evenly) """
+        ranked = list(game_ids)
+        self.rng.shuffle(ranked)
+        weights = [1 / rank ** self.skew for rank in range(1, len(ranked) + 1)]
+        return self.rng.choices(ranked, weights=weights, k=count)
+
+    def comments(self, game_ids, count):
+        """ Yield count comment rows in timestamp order, spread over the days before end """
+        rng = self.rng
+        offsets = sorted(rng.random() * self.span for _ in range(count))
+        for game_id, offset in zip(self.comment_games(game_ids, count), offsets):
+            name = rng.choice(FIRST_NAMES)
+            if rng.random() < 0.5:
+                name += str(rng.randrange(1000))
+            yield {'game_id': game_id, 'commentatorsname': name,
+                   'comment': self.text(self.length(*COMMENT_LENGTH)),
+                   'timestamp': self.end - timedelta(seconds=self.span - offset)}
+
+    def picture(self):
+        """ JPEG bytes of a random two-tone placeholder cover, or None without Pillow """
+        if Image is None:
+            return None
+        rng = self.rng
+        image = Image.new('RGB', PICTURE_SIZE, tuple(rng.randrange(256) for _ in range(3)))
+        draw = ImageDraw.Draw(image)
+        for _ in range(6):
+            x, y = rng.randrange(PICTURE_SIZE[0]), rng.randrange(PICTURE_SIZE[1])
+            draw.ellipse((x, y, x + rng.randrange(50, 300), y + rng.randrange(50, 300)),
+                         fill=tuple(rng.randrange(256) for _ in range(3)))
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=80)
+        return buffer.getvalue()
+
+
+def seed_catalog(catalog, games, comments, pictures=(), batch_size=10000):
+    """ Insert games generated by a SyntheticCatalog, then comments spread over them, in one transaction of
+    batch_size-row executemany INSERTs. Returns the new games' ids. """
+    begin_immediate()
+    # past every id AUTOINCREMENT has handed out, deleted games' included, so none is reused
+    first_id = max(db.session.scalar(db.select(db.func.coalesce(db.func.max(Game.id), 0))),
+                   db.session.scalar(db.text("SELECT seq FROM sqlite_sequence WHERE name = 'game'")) or 0) + 1
+    position = db.session.scalar(db.select(db.func.coalesce(db.func.max(Game.position), 0)))
+    game_ids = range(first_id, first_id + games)
+    rows = [dict(catalog.game(pictures), id=game_id, position=position + offset)
+            for offset, game_id in enumerate(game_ids, 1)]
+    with query_inspector.expect_slow():
+        for start in range(0, len(rows), batch_size):
+            db.session.execute(db.insert(Game), rows[start:start + batch_size])
+        stats = bulk_insert_comments(catalog.comments(game_ids, comments) if games else (), batch_size)
+    if stats:
+        game = Game.__table__
+        db.session.execute(game.update().where(game.c.id == db.bindparam('game_id'))
+                           .values(comment_count=db.bindparam('added'), last_comment_at=db.bindparam('last')),
+                           [{'game_id': game_id, 'added': added, 'last': last}
+                            for game_id, (added, last) in stats.items()])
+    db.session.commit()
+    page_cache.invalidate('catalog')
+    return list(game_ids)
+
+
+def bulk_insert_comments(rows, batch_size):
+    """ Insert comment rows inside the session's open transaction, returning {game_id: (added, last timestamp)}.
+    The comments indexes and FTS insert trigger are dropped for the load and recreated from their stored SQL
+    afterwards, and the new rows are added to comment_fts in one INSERT ... SELECT: building them once at the end
+    is several times faster than maintaining them row by row. """
+    schema = db.session.execute(db.text(
+        "SELECT type, name, sql FROM sqlite_master "
+        "WHERE tbl_name = 'comments' AND sql IS NOT NULL AND (type = 'index' OR name = 'comment_fts_insert')")).all()
+    for kind, name, sql in schema:
+        db.session.execute(db.text(f'DROP {kind.upper()} "{name}"'))
+    last_id = db.session.scalar(db.select(db.func.coalesce(db.func.max(Comments.commentid), 0)))
+
+    stats = {}
+    batch = []
+    for row in rows:
+        added, last = stats.get(row['game_id'], (0, row['timestamp']))
+        stats[row['game_id']] = (added + 1, max(last, row['timestamp']))
+        batch.append(row)
+        if len(batch) >= batch_size:
+            db.session.execute(db.insert(Comments), batch)
+            batch.clear()
+    if batch:
+        db.session.execute(db.insert(Comments), batch)
+
+    for kind, name, sql in schema:
+        db.session.execute(db.text(sql))
+    if any(name == 'comment_fts_insert' for kind, name, sql in schema):
+        db.session.execute(db.text("INSERT INTO comment_fts(rowid, comment) "
+                                   "SELECT commentid, comment FROM comments WHERE commentid > :last_id"),
+                           {'last_id': last_id})
+    return stats
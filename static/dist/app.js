@@ -0,0 +1,89 @@
+document.addEventListener('DOMContentLoaded', function () {
+document.querySelectorAll('[data-autohide]').forEach(function (flash) {
+setTimeout(function () {
+flash.style.transition = 'opacity 0.5s ease';
+flash.style.opacity = '0';
+setTimeout(function () {
+flash.remove();
+}, 500);
+}, 3000);
+});
+var gameInfo = document.querySelector('.game-info-content');
+var gameDescription = document.querySelector('.game-description');
+document.querySelectorAll('input[name="toggle"]').forEach(function (radio) {
+radio.addEventListener('change', function () {
+if (this.value === 'info') {
+gameInfo.style.display = 'block';
+gameDescription.style.display = 'none';
+} else {
+gameInfo.style.display = 'none';
+gameDescription.style.display = 'block';
+}
+});
+});
+var loadOlderComments = document.querySelector('.comments-section .load-older');
+if (loadOlderComments) {
+loadOlderComments.addEventListener('click', function (event) {
+event.preventDefault();
+var url = new URL(loadOlderComments.dataset.fragmentUrl, window.location.href);
+url.searchParams.set('older', loadOlderComments.dataset.cursor);
+fetch(url).then(function (response) {
+var cursor = response.headers.get('X-Older-Cursor');
+return response.text().then(function (html) {
+document.getElementById('comment-list').insertAdjacentHTML('beforeend', html);
+if (cursor) {
+loadOlderComments.dataset.cursor = cursor;
+loadOlderComments.href = loadOlderComments.href.replace(/older=[^&]*/,
+'older=' + encodeURIComponent(cursor));
+} else {
+loadOlderComments.remove();
+}
+});
+});
+});
+}
+var instructions = document.getElementById('instructions-content');
+var toggleButton = document.querySelector('.toggle-button');
+if (instructions && toggleButton) {
+instructions.style.display = 'none';
+toggleButton.addEventListener('click', function () {
+instructions.style.display = instructions.style.display === 'none' ? 'block' : 'none';
+});
+}
+var filterForm = document.querySelector('.comment-filters');
+var moderationList = document.getElementById('moderation-list');
+var loadOlderModeration = document.querySelector('.moderation .load-older');
+if (filterForm && moderationList && loadOlderModeration) {
+var loadComments = function (cursor) {
+var url = new URL(filterForm.dataset.fragmentUrl, window.location.href);
+new FormData(filterForm).forEach(function (value, key) {
+if (value) {
+url.searchParams.set(key, value);
+}
+});
+if (cursor) {
+url.searchParams.set('older', cursor);
+}
+return fetch(url).then(function (response) {
+var older = response.headers.get('X-Older-Cursor');
+return response.text().then(function (html) {
+if (cursor) {
+moderationList.insertAdjacentHTML('beforeend', html);
+} else {
+moderationList.innerHTML = html;
+}
+loadOlderModeration.dataset.cursor = older || '';
+loadOlderModeration.hidden = !older;
+});
+});
+};
+filterForm.addEventListener('submit', function (event) {
+event.preventDefault();
+loadComments(null);
+});
+loadOlderModeration.addEventListener('click', function (event) {
+event.preventDefault();
+loadComments(loadOlderModeration.dataset.cursor);
+});
+}
+});
@@ -0,0 +1,76 @@
+from app import Game, db
+from seed_data import SyntheticCatalog, seed_catalog
+
+
+def test_matching_etag_gets_304_without_body(client, game_id):
+    first = client.get(f'/api/games/{game_id}')
+    assert first.status_code == 200 and 'ETag' in first.headers
+
+    again = client.get(f'/api/games/{game_id}', headers={'If-None-Match': first.headers['ETag']})
+
+    assert again.status_code == 304
+    assert again.data == b''
+    assert again.headers['ETag'] == first.headers['ETag']
+
+
+def test_weak_etag_from_compression_still_matches(client):
+    listing = client.get('/api/games', headers={'Accept-Encoding': 'gzip'})
+    assert listing.headers['Content-Encoding'] == 'gzip'
+    assert listing.headers['ETag'].startswith('W/')
+
+    again = client.get('/api/games', headers={'Accept-Encoding': 'gzip', 'If-None-Match': listing.headers['ETag']})
+
+    assert again.status_code == 304
+
+
+def test_etag_changes_when_game_is_written(client, game_id):
+    etag = client.get(f'/api/games/{game_id}').headers['ETag']
+    comments_etag = client.get(f'/api/games/{game_id}/comments').headers['ETag']
+
+    client.post(f'/game/{game_id}/add_comment', data={'name': 'api test', 'comment': 'Bumps the version.'})
+
+    game = client.get(f'/api/games/{game_id}', headers={'If-None-Match': etag})
+    comments = client.get(f'/api/games/{game_id}/comments', headers={'If-None-Match': comments_etag})
+    assert game.status_code == 200 and game.headers['ETag'] != etag
+    assert comments.status_code == 200
+    assert comments.json['comments'][0]['comment'] == 'Bumps the version.'
+
+
+def test_etag_depends_on_requested_fields(client, game_id):
+    full = client.get(f'/api/games/{game_id}')
+
+    names_only = client.get(f'/api/games/{game_id}?fields=gamename', headers={'If-None-Match': full.headers['ETag']})
+
+    assert names_only.status_code == 200
+    assert list(names_only.json) == ['gamename']
+
+
+def test_missing_game_is_404_json(client):
+    response = client.get('/api/games/999999999')
+
+    assert response.status_code == 404
+    assert response.is_json
+
+
+def test_deleted_game_id_is_not_reused(admin_client):
+    last_id = db.session.scalar(db.select(db.func.max(Game.id)))
+    db.session.remove()
+    etag = admin_client.get(f'/api/games/{last_id}').headers['ETag']
+
+    admin_client.post('/admin', data={'action': 'delete', 'id': str(last_id)})
+    admin_client.post('/admin', data={'action': 'add', 'gamename': 'Successor', 'description': 'Added after.',
+                                      'developer': 'Dev', 'publisher': 'Pub', 'releasedate': '01/02/2020'})
+
+    new_id = db.session.scalar(db.select(Game.id).where(Game.gamename == 'Successor'))
+    assert new_id > last_id
+    assert admin_client.get(f'/api/games/{last_id}', headers={'If-None-Match': etag}).status_code == 404
+
+
+def test_seeded_games_do_not_reuse_deleted_ids(admin_client):
+    last_id = db.session.scalar(db.select(db.func.max(Game.id)))
+    db.session.remove()
+    admin_client.post('/admin', data={'action': 'delete', 'id': str(last_id)})
+
+    [seeded] = seed_catalog(SyntheticCatalog(), games=1, comments=0)
+
+    assert seeded > last_id
@@ -0,0 +1,137 @@
+from datetime import datetime
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from app import Comments, Game, bulk_comment_criteria, db, delete_comments, refresh_comment_stats
+
+
+@pytest.fixture
+def games():
+    """ Two games whose comments (and their stats) are known; returns their ids """
+    ids = []
+    for name, comments in (('Moderated', [('spammer', 'Buy 100% cheap_coins now', datetime(2026, 1, 1, 10)),
+                                          ('spammer', 'Visit my site', datetime(2026, 1, 2, 10)),
+                                          ('regular', 'Loved the ending', datetime(2026, 1, 3, 10))]),
+                           ('Bystander', [('spammer', 'Cheap coins again', datetime(2026, 1, 1, 12)),
+                                          ('regular', 'Beat it in 100 hours', datetime(2026, 1, 4, 12))])):
+        game = Game(gamename=name, description='Bulk delete test.', developer='Dev', publisher='Pub',
+                    releasedate='01/02/2020', position=db.session.scalar(db.select(db.func.max(Game.position))) + 1)
+        game.comments = [Comments(commentatorsname=who, comment=text, timestamp=when) for who, text, when in comments]
+        db.session.add(game)
+        db.session.flush()
+        refresh_comment_stats(Game.id == game.id)
+        ids.append(game.id)
+    db.session.commit()
+    return ids
+
+
+def comment_ids(game_id, **filters):
+    return db.session.scalars(db.select(Comments.commentid).filter_by(game_id=game_id, **filters)
+                              .order_by(Comments.timestamp)).all()
+
+
+def remaining(game_id):
+    return db.session.scalars(db.select(Comments.comment).where(Comments.game_id == game_id)
+                              .order_by(Comments.timestamp)).all()
+
+
+def delete(dry_run=False, **form):
+    criteria, _ = bulk_comment_criteria(MultiDict(form))
+    return delete_comments(criteria, dry_run=dry_run)
+
+
+def test_ids_mode_deletes_the_listed_comments(games):
+    moderated, bystander = games
+    first, _, third = comment_ids(moderated)
+
+    count, game_ids = delete(mode='ids', ids=f'{first}, {third} 999999999')
+
+    assert (count, game_ids) == (2, {moderated})
+    assert remaining(moderated) == ['Visit my site']
+
+
+def test_name_mode_deletes_across_games(games):
+    moderated, bystander = games
+
+    count, game_ids = delete(mode='name', name=' spammer ')
+
+    assert (count, game_ids) == (3, {moderated, bystander})
+    assert remaining(moderated) == ['Loved the ending']
+    assert remaining(bystander) == ['Beat it in 100 hours']
+
+
+def test_game_mode_honours_the_time_window(games):
+    moderated, bystander = games
+
+    count, game_ids = delete(mode='game', game=str(moderated), since='2026-01-02T00:00', until='2026-01-03T10:00')
+
+    assert (count, game_ids) == (1, {moderated})
+    assert remaining(moderated) == ['Buy 100% cheap_coins now', 'Loved the ending']
+    assert len(remaining(bystander)) == 2
+
+
+def test_text_mode_matches_percent_and_underscore_literally(games):
+    moderated, bystander = games
+
+    # unescaped, '%' and '_' would be LIKE wildcards and match 'Beat it in 100 hours' and 'Cheap coins'
+    assert delete(mode='text', pattern='100%') == (1, {moderated})
+    assert delete(mode='text', pattern='p_c') == (0, set())
+    assert remaining(bystander) == ['Cheap coins again', 'Beat it in 100 hours']
+
+
+def test_dry_run_counts_without_deleting(games):
+    moderated, bystander = games
+    versions = db.session.scalars(db.select(Game.version).where(Game.id.in_(games)).order_by(Game.id)).all()
+
+    assert delete(dry_run=True, mode='name', name='spammer') == (3, {moderated, bystander})
+
+    assert len(remaining(moderated)) == 3 and len(remaining(bystander)) == 2
+    assert db.session.scalars(db.select(Game.version).where(Game.id.in_(games)).order_by(Game.id)).all() == versions
+
+
+def test_affected_games_get_fresh_stats_and_version(games):
+    moderated, bystander = games
+    before = {game.id: game.version for game in db.session.scalars(db.select(Game).where(Game.id.in_(games)))}
+    db.session.remove()
+
+    delete(mode='game', game=str(moderated), since='2026-01-03T00:00')
+
+    game = db.session.get(Game, moderated)
+    assert (game.comment_count, game.last_comment_at) == (2, datetime(2026, 1, 2, 10))
+    assert game.version == before[moderated] + 1
+    untouched = db.session.get(Game, bystander)
+    assert (untouched.comment_count, untouched.version) == (2, before[bystander])
+
+
+def test_deleting_every_comment_clears_last_comment_at(games):
+    moderated, bystander = games
+
+    delete(mode='game', game=str(moderated))
+
+    game = db.session.get(Game, moderated)
+    assert (game.comment_count, game.last_comment_at) == (0, None)
+
+
+@pytest.mark.parametrize('form, message', [
+    ({}, 'Choose which comments to delete'),
+    ({'mode': 'ids', 'ids': '1, two'}, 'whole numbers'),
+    ({'mode': 'ids', 'ids': ' '}, 'at least one'),
+    ({'mode': 'name', 'name': ''}, 'commenter name'),
+    ({'mode': 'game', 'game': ''}, 'game ID'),
+    ({'mode': 'game', 'game': '1', 'since': 'yesterday'}, 'Invalid time window'),
+    ({'mode': 'text', 'pattern': '  '}, 'text to match'),
+])
+def test_incomplete_selections_are_refused(form, message):
+    with pytest.raises(ValueError, match=message):
+        bulk_comment_criteria(MultiDict(form))
+
+
+def test_admin_form_reports_the_count(admin_client, games):
+    response = admin_client.post('/admin/comments/delete', data={'mode': 'name', 'name': 'spammer', 'dry_run': '1'},
+                                 follow_redirects=True)
+
+    assert b'Dry run: 3 comments (by spammer) across 2 games would be deleted.' in response.data
+    response = admin_client.post('/admin/comments/delete', data={'mode': 'name', 'name': 'spammer'},
+                                 follow_redirects=True)
+    assert b'Deleted 3 comments (by spammer) across 2 games.' in response.data
@@ -0,0 +1,81 @@
+import io
+import json
+
+import pytest
+
+from app import Game, db
+from catalog_import import import_games
+
+DEVELOPER = 'Import Test Studio'
+
+
+def game_row(name, **overrides):
+    return dict({'gamename': name, 'description': 'Imported.', 'developer': DEVELOPER, 'publisher': 'Pub',
+                 'releasedate': '01/02/2020'}, **overrides)
+
+
+def ndjson(*lines):
+    return io.BytesIO(''.join((line if isinstance(line, str) else json.dumps(line)) + '\n'
+                              for line in lines).encode())
+
+
+def imported():
+    return db.session.execute(db.select(Game.gamename, Game.position).where(Game.developer == DEVELOPER)
+                              .order_by(Game.position)).all()
+
+
+def test_bad_encoding_imports_nothing():
+    report = import_games(io.BytesIO('gamename,description\nCaf\xe9,x\n'.encode('latin-1')), 'csv')
+
+    assert report.inserted == 0
+    assert 'not UTF-8' in report.file_error
+    assert 'Nothing imported' in report.summary()
+
+
+def test_bad_encoding_upload_is_reported_not_500(admin_client):
+    before = db.session.scalar(db.select(db.func.count(Game.id)))
+    db.session.remove()
+
+    response = admin_client.post('/admin/import', data={'catalog': (io.BytesIO(b'\xff\xfe\x00bad'), 'games.csv')},
+                           content_type='multipart/form-data', follow_redirects=True)
+
+    assert response.status_code == 200
+    assert b'not UTF-8' in response.data
+    assert db.session.scalar(db.select(db.func.count(Game.id))) == before
+
+
+def test_malformed_rows_are_reported_by_line():
+    report = import_games(ndjson(game_row('First'), '{"gamename": ', game_row('Second', description=''),
+                                 '[1, 2]', game_row('Third')), 'ndjson')
+
+    assert report.inserted == 2
+    assert [line for line, message in report.errors] == [2, 3, 4]
+    assert 'description is required' in report.errors[1][1]
+    assert [name for name, position in imported()] == ['First', 'Third']
+
+
+def test_refused_duplicate_is_isolated_from_its_batch():
+    # games have no natural key; stand in for one so the database refuses the second copy
+    db.session.execute(db.text('CREATE UNIQUE INDEX ix_test_import_name ON game (gamename) '
+                               f"WHERE developer = '{DEVELOPER}'"))
+    db.session.commit()
+
+    report = import_games(ndjson(game_row('Alpha'), game_row('Beta'), game_row('Alpha'), game_row('Gamma')),
+                          'ndjson', batch_size=10)
+
+    assert report.inserted == 3
+    assert [line for line, message in report.errors] == [3]
+    assert 'UNIQUE' in report.errors[0][1]
+    positions = [position for name, position in imported()]
+    assert positions == list(range(positions[0], positions[0] + 3))
+
+
+@pytest.mark.parametrize('batch_size', [1, 2, 3, 5, 6])
+def test_batch_boundaries_keep_every_row_in_order(batch_size):
+    last = db.session.scalar(db.select(db.func.max(Game.position)))
+    names = [f'Game {n}' for n in range(5)]
+
+    report = import_games(ndjson(*[game_row(name) for name in names]), 'ndjson', batch_size=batch_size)
+
+    assert report.inserted == 5 and not report.errors
+    assert imported() == [(name, last + n) for n, name in enumerate(names, 1)]
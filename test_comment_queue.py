@@ -0,0 +1,126 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from app import Comments, Game, db, write_comment_batch
+from comment_queue import CommentWriter, read_journal
+from conftest import app
+
+
+class FlakyStore:
+    """ write_batch stand-in that fails while the batch holds a comment named in failing """
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.stored = []
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, batch, replay):
+        with self.lock:
+            self.calls.append(([entry['comment'] for entry in batch], replay))
+            if self.failing & {entry['comment'] for entry in batch}:
+                raise RuntimeError('database is locked')
+            self.stored.extend(entry['comment'] for entry in batch)
+
+
+def make_writer(store, journal_dir):
+    return CommentWriter(store, str(journal_dir), batch_rows=1, flush_interval=0, retry_delay=0.001,
+                         max_retry_delay=0.01)
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.005)
+
+
+def comment(text):
+    return {'game_id': 1, 'commentatorsname': 'tester', 'comment': text, 'timestamp': '2026-01-01T00:00:00'}
+
+
+def test_failed_batch_stays_in_journal_after_later_commits(tmp_path):
+    store = FlakyStore(failing={'first'})
+    writer = make_writer(store, tmp_path)
+    writer.start()
+    writer.submit(comment('first'))
+    wait_for(lambda: len(store.calls) >= 5)
+    writer.submit(comment('second'))
+    wait_for(lambda: 'second' in store.stored)
+    writer.stop()
+
+    pending = [entry['comment'] for entry in read_journal(writer.journal_path)]
+    assert 'first' in pending
+    assert store.stored == ['second']
+
+
+def test_failed_batch_is_retried_and_journal_truncated(tmp_path):
+    store = FlakyStore(failing={'first'})
+    writer = make_writer(store, tmp_path)
+    writer.start()
+    writer.submit(comment('first'))
+    writer.submit(comment('second'))
+    wait_for(lambda: 'second' in store.stored)
+    store.failing.clear()
+    wait_for(lambda: 'first' in store.stored)
+    writer.stop()
+
+    assert sorted(store.stored) == ['first', 'second']
+    assert os.path.getsize(writer.journal_path) == 0
+
+
+def test_checkpoint_never_passes_an_uncommitted_seq(tmp_path):
+    path = tmp_path / 'comment-journal-1.ndjson'
+    lines = [dict(comment('a'), seq=1), dict(comment('b'), seq=2), dict(comment('c'), seq=3), {'committed': 1}]
+    path.write_text(''.join(json.dumps(line) + '\n' for line in lines))
+
+    assert [entry['seq'] for entry in read_journal(path)] == [2, 3]
+
+
+def test_restart_replays_orphaned_journal(tmp_path):
+    failing = FlakyStore(failing={'lost'})
+    writer = make_writer(failing, tmp_path)
+    writer.start()
+    writer.submit(comment('lost'))
+    wait_for(lambda: len(failing.calls) >= 5)
+    writer.stop()
+    # pretend the process that wrote it has died
+    orphan = tmp_path / 'comment-journal-999999999.ndjson'
+    os.rename(writer.journal_path, orphan)
+
+    store = FlakyStore()
+    restarted = make_writer(store, tmp_path)
+    restarted.start()
+    restarted.stop()
+
+    assert store.calls == [(['lost'], True)]
+    assert not orphan.exists()
+
+
+def test_failed_replay_leaves_journal_for_next_start(tmp_path):
+    orphan = tmp_path / 'comment-journal-999999999.ndjson'
+    orphan.write_text(json.dumps(dict(comment('lost'), seq=1)) + '\n')
+
+    writer = make_writer(FlakyStore(failing={'lost'}), tmp_path)
+    writer.start()
+    writer.stop()
+
+    assert [entry['comment'] for entry in read_journal(orphan)] == ['lost']
+
+
+def test_replay_skips_comments_already_stored():
+    game_id = db.session.scalar(db.select(Game.id).limit(1))
+    before = db.session.get(Game, game_id).comment_count or 0
+    queued = [{'game_id': game_id, 'commentatorsname': 'replayer', 'comment': 'Written before the crash.',
+               'timestamp': datetime(2026, 1, 1, 12, 0).isoformat()}]
+    db.session.remove()
+
+    write_comment_batch(app, queued)
+    write_comment_batch(app, queued, replay=True)
+
+    stored = db.session.scalars(db.select(Comments).where(Comments.commentatorsname == 'replayer')).all()
+    assert len(stored) == 1
+    assert db.session.get(Game, game_id).comment_count == before + 1
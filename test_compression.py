@@ -0,0 +1,98 @@
+import gzip
+
+import pytest
+from werkzeug.test import Client
+from werkzeug.wrappers import Response
+
+import compression
+from compression import CompressionMiddleware, negotiate
+
+PAGE = b'<p>' + b'All work and no play makes Jack a dull boy. ' * 100 + b'</p>'
+
+
+@pytest.fixture
+def with_brotli(monkeypatch):
+    # negotiate only needs to know whether brotli is importable
+    monkeypatch.setattr(compression, 'brotli', object())
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('', None),
+    ('identity', None),
+    ('gzip', 'gzip'),
+    ('GZip', 'gzip'),
+    ('gzip;q=0', None),
+    ('gzip; q=0.5', 'gzip'),
+    ('*', 'gzip'),
+    ('*;q=0', None),
+    ('*, gzip;q=0', None),
+    ('gzip;q=nonsense', None),
+])
+def test_negotiate_gzip(header, expected, monkeypatch):
+    monkeypatch.setattr(compression, 'brotli', None)
+
+    assert negotiate(header) == expected
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('gzip, deflate, br', 'br'),
+    ('br;q=0.5, gzip', 'gzip'),
+    ('gzip;q=1.0, br;q=0.9', 'gzip'),
+    ('br;q=0.8, gzip;q=0.8', 'br'),
+    ('br;q=0, gzip', 'gzip'),
+    ('br;q=0, *', 'gzip'),
+    ('*;q=0.5, gzip;q=0.1', 'br'),
+    ('br;level=4;q=0.2, gzip;q=0.1', 'br'),
+])
+def test_negotiate_prefers_the_higher_quality(header, expected, with_brotli):
+    assert negotiate(header) == expected
+
+
+def wsgi_app(body=PAGE, content_type='text/html; charset=utf-8', status=200, stream=False, **headers):
+    def app(environ, start_response):
+        chunks = (body[i:i + 300] for i in range(0, len(body), 300)) if stream else body
+        return Response(chunks, status=status, content_type=content_type, headers=headers)(environ, start_response)
+    return Client(CompressionMiddleware(app))
+
+
+def test_gzips_text_for_clients_that_accept_it():
+    response = wsgi_app(ETag='"abc"').get('/', headers={'Accept-Encoding': 'gzip;q=0.5'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert response.headers['ETag'] == 'W/"abc"'
+    assert int(response.headers['Content-Length']) == len(response.data)
+    assert gzip.decompress(response.data) == PAGE
+
+
+def test_streamed_body_is_compressed_chunk_by_chunk():
+    response = wsgi_app(stream=True).get('/', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    assert gzip.decompress(response.data) == PAGE
+
+
+@pytest.mark.parametrize('client, accept', [
+    (wsgi_app(), 'gzip;q=0'),
+    (wsgi_app(), 'identity'),
+    (wsgi_app(body=b'<p>short</p>'), 'gzip'),
+    (wsgi_app(content_type='image/jpeg'), 'gzip'),
+    (wsgi_app(status=404), 'gzip'),
+    (wsgi_app(**{'Cache-Control': 'no-transform'}), 'gzip'),
+])
+def test_passes_through_untouched(client, accept):
+    response = client.get('/', headers={'Accept-Encoding': accept})
+
+    assert 'Content-Encoding' not in response.headers
+    assert response.data in (PAGE, b'<p>short</p>')
+
+
+def test_same_body_is_compressed_once():
+    middleware = CompressionMiddleware(lambda environ, start_response: Response(PAGE, content_type='text/html')(
+        environ, start_response))
+    client = Client(middleware)
+    first = client.get('/', headers={'Accept-Encoding': 'gzip'}).data
+
+    assert client.get('/', headers={'Accept-Encoding': 'gzip'}).data == first
+    assert middleware.cache.stats()['hits'] == 1
@@ -0,0 +1,33 @@
+from sqlalchemy.pool import QueuePool, StaticPool
+
+from app import create_app, db
+
+
+def build(tmp_path, **config):
+    return create_app(dict({'SECRET_KEY': 'test', 'BUILD_ASSETS_ON_STARTUP': False}, **config),
+                      instance_path=str(tmp_path / 'instance'))
+
+
+def test_in_memory_sqlite_gets_no_pool_size_options(tmp_path):
+    app = build(tmp_path, SQLALCHEMY_DATABASE_URI='sqlite://')
+
+    with app.app_context():
+        assert isinstance(db.engine.pool, StaticPool)
+        assert db.session.execute(db.text('SELECT 1')).scalar() == 1
+
+
+def test_file_sqlite_gets_a_sized_queue_pool(tmp_path):
+    app = build(tmp_path, SQLALCHEMY_DATABASE_URI=f'sqlite:///{tmp_path / "games.db"}')
+
+    with app.app_context():
+        assert isinstance(db.engine.pool, QueuePool)
+        assert db.engine.pool.size() == 10
+
+
+def test_configured_engine_options_override_the_pool_defaults(tmp_path):
+    app = build(tmp_path, SQLALCHEMY_DATABASE_URI=f'sqlite:///{tmp_path / "games.db"}',
+                SQLALCHEMY_ENGINE_OPTIONS={'pool_size': 3})
+
+    with app.app_context():
+        assert db.engine.pool.size() == 3
+        assert db.engine.pool._max_overflow == 20
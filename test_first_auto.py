@@ -62,9 +62,10 @@ class TestUnit:
 
         sa(driver.find_element(By.CLASS_NAME, "success").is_displayed(), "The success message was not displayed")
 
+        # comments are listed newest first, so the freshly posted one is on top
         displayed_time = driver.find_element(By.XPATH,
                                              "(//div[@class='comments-section']//ul/li//span[@class='comment-time'])["
-                                             "last()]").text
+                                             "1]").text
         displayed_time_clean = displayed_time.strip("() ")
         sa(current_time in displayed_time_clean,
            f"Displayed time '{displayed_time_clean}' does not contain the expected time - '{current_time}'")
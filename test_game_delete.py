@@ -0,0 +1,54 @@
+from sqlalchemy import event
+
+from app import Comments, Game, db, list_games
+
+
+def catalog():
+    return db.session.execute(db.select(Game.id, Game.position).order_by(Game.position)).all()
+
+
+def test_delete_keeps_ids_and_closes_up_positions_in_one_update(admin_client):
+    before = catalog()
+    doomed = before[len(before) // 2].id
+    db.session.add(Comments(commentatorsname='doomed', comment='Goes with its game.', game_id=doomed))
+    db.session.commit()
+    db.session.remove()
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        admin_client.post('/admin', data={'action': 'delete', 'id': str(doomed)})
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+    after = catalog()
+    assert [game_id for game_id, position in after] == [game_id for game_id, position in before if game_id != doomed]
+    assert [position for game_id, position in after] == list(range(1, len(before)))
+    assert len([s for s in statements if s.startswith('UPDATE game SET position')]) == 1
+    assert db.session.scalar(db.select(db.func.count()).where(Comments.game_id == doomed)) == 0
+
+
+def test_missing_game_is_reported(admin_client):
+    count = len(catalog())
+    db.session.remove()
+
+    response = admin_client.post('/admin', data={'action': 'delete', 'id': '999999999'}, follow_redirects=True)
+
+    assert b'No game found with ID 999999999' in response.data
+    assert len(catalog()) == count
+
+
+def test_id_order_is_display_order_after_deletes_and_adds(admin_client):
+    for game_id, position in catalog()[::3]:
+        admin_client.post('/admin', data={'action': 'delete', 'id': str(game_id)})
+    admin_client.post('/admin', data={'action': 'add', 'gamename': 'Latecomer', 'description': 'Added last.',
+                                      'developer': 'Dev', 'publisher': 'Pub', 'releasedate': '01/02/2020'})
+
+    rows, prev_cursor, next_cursor = list_games(per_page=1000)
+
+    assert [row.id for row in rows] == [game_id for game_id, position in catalog()]
+    assert [row.position for row in rows] == list(range(1, len(rows) + 1))
+    assert rows[-1].gamename == 'Latecomer'
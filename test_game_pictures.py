@@ -0,0 +1,101 @@
+import hashlib
+import io
+
+import pytest
+from PIL import Image
+
+from app import Game, db, upload_store
+from image_variants import remove_variants, variants_missing
+from upload_store import UploadStore
+
+
+@pytest.fixture
+def new_blobs():
+    """ Names of pictures the test added to the store; removed again afterwards """
+    before = set(upload_store.blobs())
+
+    def added():
+        return set(upload_store.blobs()) - before
+
+    yield added
+    for filename in added():
+        upload_store.delete(filename)
+        remove_variants(upload_store.folder, filename)
+
+
+def update_picture(client, game_id, data, filename):
+    return client.post('/admin', data={'action': 'update', 'id': str(game_id), 'gamename': '', 'description': '',
+                                       'developer': '', 'publisher': '', 'releasedate': '',
+                                       'gamepicture': (io.BytesIO(data), filename)},
+                       content_type='multipart/form-data', follow_redirects=True)
+
+
+def test_non_image_upload_is_rejected(admin_client, new_blobs):
+    game = db.session.scalars(db.select(Game).limit(1)).one()
+    picture, name = game.gamepicture, game.gamename
+    db.session.remove()
+
+    response = update_picture(admin_client, game.id, b'this is not a picture', 'cover.jpg')
+
+    assert response.status_code == 200
+    assert b'Game picture is not a valid image' in response.data
+    game = db.session.get(Game, game.id)
+    assert (game.gamepicture, game.gamename) == (picture, name)
+    assert not new_blobs()
+
+
+def jpeg(color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (320, 420), color).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def test_upload_stores_blob_with_variants(admin_client, game_id, new_blobs):
+    update_picture(admin_client, game_id, jpeg((10, 200, 30)), 'cover.jpg')
+
+    [filename] = new_blobs()
+    assert db.session.get(Game, game_id).gamepicture == filename
+    assert not variants_missing(upload_store.folder, filename)
+
+
+def test_reupload_rebuilds_missing_variants(admin_client, game_id, new_blobs):
+    picture = jpeg((200, 10, 30))
+    update_picture(admin_client, game_id, picture, 'cover.jpg')
+    [filename] = new_blobs()
+    remove_variants(upload_store.folder, filename)
+
+    update_picture(admin_client, game_id, picture, 'cover.jpg')
+
+    assert not variants_missing(upload_store.folder, filename)
+
+
+def test_same_bytes_under_different_names_are_stored_once(admin_client, new_blobs):
+    first, second = db.session.scalars(db.select(Game.id).order_by(Game.id).limit(2)).all()
+    db.session.remove()
+    picture = jpeg((30, 60, 90))
+
+    update_picture(admin_client, first, picture, 'cover.JPEG')
+    update_picture(admin_client, second, picture, 'screenshot.png')
+
+    [filename] = new_blobs()
+    assert filename.endswith('.jpg')
+    assert db.session.get(Game, first).gamepicture == db.session.get(Game, second).gamepicture == filename
+
+
+def test_extension_follows_the_contents_not_the_client(admin_client, game_id, new_blobs):
+    buffer = io.BytesIO()
+    Image.new('RGB', (320, 420), (90, 60, 30)).save(buffer, 'PNG')
+
+    update_picture(admin_client, game_id, buffer.getvalue(), 'cover.jpg')
+
+    [filename] = new_blobs()
+    assert filename.endswith('.png')
+
+
+def test_unvalidated_blob_has_no_extension(tmp_path):
+    store = UploadStore(str(tmp_path), max_bytes=100)
+
+    filename, created = store.save(io.BytesIO(b'raw bytes'))
+
+    assert created and filename == hashlib.sha256(b'raw bytes').hexdigest()
+    assert store.blobs() == [filename]
@@ -0,0 +1,87 @@
+import threading
+
+import pytest
+
+from metrics import RequestMetrics, _Shard, labels, observe
+
+
+def record(metrics, endpoint, status=200, seconds=0.003, size=2000):
+    metrics.started()
+    metrics.finished(endpoint, 'GET', status, seconds, size)
+
+
+def test_each_thread_records_into_its_own_shard():
+    metrics = RequestMetrics()
+    shards = []
+    ready = threading.Barrier(3)
+    done = threading.Event()
+
+    def worker():
+        record(metrics, 'site.index')
+        shards.append(metrics._local.shard)
+        ready.wait()
+        done.wait()
+
+    threads = [threading.Thread(target=worker) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    ready.wait()
+    record(metrics, 'site.index')
+
+    assert len({id(shard) for shard in shards + [metrics._local.shard]}) == 3
+    assert metrics.snapshot().requests == {('site.index', 'GET', 200): 3}
+    done.set()
+    for thread in threads:
+        thread.join()
+
+
+def test_finished_threads_are_folded_into_the_retired_shard():
+    metrics = RequestMetrics()
+    threads = [threading.Thread(target=record, args=(metrics, 'site.game_page')) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+        thread.join()
+
+    total = metrics.snapshot()
+
+    assert metrics._shards == []
+    assert total.requests == {('site.game_page', 'GET', 200): 5}
+    assert total.in_flight == 0
+
+
+def test_merge_sums_counters_and_histograms():
+    buckets = (0.01, 0.1)
+    a, b = _Shard(), _Shard()
+    a.requests[('x', 'GET', 200)] = 2
+    b.requests[('x', 'GET', 200)] = 3
+    b.requests[('x', 'GET', 404)] = 1
+    a.in_flight, b.in_flight = 1, 2
+    for shard, seconds in ((a, 0.005), (b, 0.05), (b, 5)):
+        observe(shard.latency, ('x', 'GET'), buckets, seconds)
+
+    total = _Shard()
+    total.merge(a)
+    total.merge(b)
+
+    assert total.requests == {('x', 'GET', 200): 5, ('x', 'GET', 404): 1}
+    assert total.in_flight == 3
+    assert total.latency[('x', 'GET')] == [1, 1, 1, pytest.approx(5.055)]
+
+
+def test_render_reports_cumulative_buckets_across_threads():
+    metrics = RequestMetrics(latency_buckets=(0.01, 0.1), size_buckets=(1000,))
+    thread = threading.Thread(target=record, args=(metrics, 'site.index'), kwargs={'seconds': 0.05, 'size': 500})
+    thread.start()
+    thread.join()
+    record(metrics, 'site.index', seconds=0.5, size=5000)
+
+    text = metrics.render()
+    series = labels(endpoint='site.index', method='GET')
+
+    assert f'http_requests_total{labels(endpoint="site.index", method="GET", status=200)} 2' in text
+    assert 'http_request_duration_seconds_bucket{endpoint="site.index",method="GET",le="0.01"} 0' in text
+    assert 'http_request_duration_seconds_bucket{endpoint="site.index",method="GET",le="0.1"} 1' in text
+    assert 'http_request_duration_seconds_bucket{endpoint="site.index",method="GET",le="+Inf"} 2' in text
+    assert f'http_request_duration_seconds_count{series} 2' in text
+    assert 'http_response_size_bytes_bucket{endpoint="site.index",le="1000"} 1' in text
+    assert 'http_requests_in_flight 0' in text
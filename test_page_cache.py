@@ -0,0 +1,85 @@
+from app import page_cache
+from page_cache import PageCache
+
+
+def test_evicts_least_recently_used_first():
+    cache = PageCache(max_bytes=30)
+    cache.set('a', b'x' * 10)
+    cache.set('b', b'x' * 10)
+    cache.set('c', b'x' * 10)
+    cache.get('a')
+
+    cache.set('d', b'x' * 10)
+
+    assert cache.get('b') is None
+    assert [key for key in 'acd' if cache.get(key) is not None] == ['a', 'c', 'd']
+    assert cache.stats()['evictions'] == 1
+
+
+def test_eviction_frees_enough_bytes_for_a_large_entry():
+    cache = PageCache(max_bytes=30)
+    for key in 'abc':
+        cache.set(key, b'x' * 10)
+
+    cache.set('big', b'x' * 25)
+
+    assert [key for key in 'abc' if cache.get(key) is not None] == []
+    assert cache.stats()['bytes'] == 25
+
+
+def test_body_larger_than_the_cache_is_not_stored():
+    cache = PageCache(max_bytes=10)
+    cache.set('a', b'x' * 5)
+
+    cache.set('huge', b'x' * 11)
+
+    assert cache.get('huge') is None
+    assert cache.get('a') is not None
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = PageCache(ttl=5, clock=clock)
+    cache.set('page', b'body', {'X': '1'})
+
+    clock.now = 4.9
+    assert cache.get('page') == (b'body', {'X': '1'})
+    clock.now = 5.0
+    assert cache.get('page') is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_without_ttl_entries_do_not_expire(clock):
+    cache = PageCache(clock=clock)
+    cache.set('page', b'body')
+
+    clock.now = 10 ** 6
+
+    assert cache.get('page') is not None
+
+
+def test_invalidated_tag_is_not_served_again():
+    cache = PageCache()
+    cache.set(('game', 1, None), b'page one', tags=[('game', 1), ('comments', 1)])
+    cache.set(('game', 2, None), b'page two', tags=[('game', 2)])
+    cache.set('home', b'home', tags=['catalog'])
+
+    cache.invalidate(('comments', 1))
+
+    assert cache.get(('game', 1, None)) is None
+    assert cache.get(('game', 2, None)) is not None
+    assert cache.get('home') is not None
+    # the entry is gone under its other tags too, so a fresh copy is tracked normally
+    cache.set(('game', 1, None), b'page one v2', tags=[('game', 1)])
+    cache.invalidate(('game', 1))
+    assert cache.get(('game', 1, None)) is None
+    assert cache.stats()['bytes'] == len(b'page two') + len(b'home')
+
+
+def test_new_comment_invalidates_cached_game_page(client, game_id):
+    client.get(f'/game/{game_id}')
+    assert page_cache.get(('game', game_id, None)) is not None
+
+    client.post(f'/game/{game_id}/add_comment', data={'name': 'cache test', 'comment': 'Fresh off the press.'})
+
+    assert page_cache.get(('game', game_id, None)) is None
+    assert b'Fresh off the press.' in client.get(f'/game/{game_id}').data
@@ -0,0 +1,86 @@
+import logging
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app import Game, db
+from conftest import app
+from query_stats import QueryInspector, RepeatedQuery, statement_shape
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine('sqlite://')
+    yield engine
+    engine.dispose()
+
+
+def run(engine, *values):
+    with engine.connect() as connection:
+        for value in values:
+            connection.execute(text('SELECT :value'), {'value': value})
+
+
+def test_repeated_statement_shape_raises_in_strict_mode(engine):
+    inspector = QueryInspector(repeat_limit=2)
+    inspector.attach(engine)
+    inspector.begin(strict=True)
+
+    run(engine, 1, 2)
+    with pytest.raises(RepeatedQuery, match='3 times'):
+        run(engine, 3)
+    assert inspector.end().count == 3
+
+
+def test_repeated_statement_shape_is_logged_once_otherwise(engine, caplog):
+    inspector = QueryInspector(repeat_limit=2)
+    inspector.attach(engine)
+    inspector.begin()
+
+    with caplog.at_level(logging.WARNING, logger='query_stats'):
+        run(engine, 1, 2, 3, 4, 5)
+
+    assert [record.message for record in caplog.records] == [
+        'statement ran 3 times in one request (possible N+1): SELECT ?']
+    inspector.end()
+
+
+def test_expected_repeats_are_not_checked(engine):
+    inspector = QueryInspector(repeat_limit=2)
+    inspector.attach(engine)
+    inspector.begin(strict=True)
+
+    with inspector.expect_repeats():
+        run(engine, 1, 2, 3)
+
+    assert inspector.end().count == 3
+
+
+def test_expanded_in_lists_share_a_shape():
+    assert statement_shape('SELECT x FROM t\n  WHERE id IN (?, ?, ?)') == statement_shape(
+        'SELECT x FROM t WHERE id IN (?)') == 'SELECT x FROM t WHERE id IN (?)'
+
+
+def test_testing_app_is_strict(game_id):
+    with app.test_request_context('/'):
+        app.preprocess_request()
+        with pytest.raises(RepeatedQuery):
+            for _ in range(app.config['QUERY_REPEAT_LIMIT'] + 1):
+                db.session.execute(db.select(Game.gamename).where(Game.id == game_id)).scalar()
+
+
+def test_debug_responses_report_query_count_and_time(monkeypatch, client):
+    monkeypatch.setitem(app.config, 'DEBUG', True)
+
+    response = client.get('/api/games')
+
+    assert response.status_code == 200
+    assert int(response.headers['X-DB-Query-Count']) >= 1
+    assert float(response.headers['X-DB-Time-Ms']) >= 0
+
+
+def test_query_headers_are_left_out_outside_debug(client):
+    response = client.get('/api/games')
+
+    assert 'X-DB-Query-Count' not in response.headers
+    assert 'X-DB-Time-Ms' not in response.headers
@@ -0,0 +1,90 @@
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from app import Comments, db
+from conftest import app
+from rate_limit import TokenBucket
+
+
+def test_burst_then_refused_with_time_to_next_token(clock):
+    bucket = TokenBucket(burst=3, refill_per_second=0.5, clock=clock)
+
+    assert [bucket.hit('client') for _ in range(3)] == [0, 0, 0]
+    assert bucket.hit('client') == 2.0
+
+
+def test_tokens_refill_over_time_up_to_burst(clock):
+    bucket = TokenBucket(burst=2, refill_per_second=1, clock=clock)
+    bucket.hit('client')
+    bucket.hit('client')
+
+    clock.now = 1.0
+    assert bucket.hit('client') == 0
+    assert bucket.hit('client') == 1.0
+    # a long idle spell refills no further than burst
+    clock.now = 100.0
+    assert [bucket.hit('client') for _ in range(3)] == [0, 0, 1.0]
+
+
+def test_refused_hits_do_not_take_tokens(clock):
+    bucket = TokenBucket(burst=1, refill_per_second=1, clock=clock)
+    bucket.hit('client')
+    bucket.hit('client')
+    bucket.hit('client')
+
+    clock.now = 1.0
+    assert bucket.hit('client') == 0
+
+
+def test_clients_have_separate_buckets(clock):
+    bucket = TokenBucket(burst=1, refill_per_second=1, clock=clock)
+    bucket.hit('a')
+
+    assert bucket.hit('a') > 0
+    assert bucket.hit('b') == 0
+
+
+def test_forgets_least_recently_seen_client_beyond_max_keys(clock):
+    bucket = TokenBucket(burst=1, refill_per_second=1, max_keys=2, clock=clock)
+    bucket.hit('a')
+    bucket.hit('b')
+    bucket.hit('a')
+
+    bucket.hit('c')
+
+    assert len(bucket) == 2
+    assert bucket.hit('b') == 0   # forgotten, so it starts with a full bucket again
+    assert bucket.hit('c') > 0
+
+
+def test_comment_flood_gets_429_with_retry_after(monkeypatch, clock, client, game_id):
+    monkeypatch.setitem(app.extensions['rate_limiters'], 'comment', TokenBucket(2, 0.5, clock=clock))
+
+    def post(ip='10.0.0.1'):
+        return client.post(f'/game/{game_id}/add_comment', data={'name': 'flood', 'comment': 'Again.'},
+                           environ_base={'REMOTE_ADDR': ip})
+
+    assert [post().status_code for _ in range(2)] == [302, 302]
+    refused = post()
+    assert refused.status_code == 429
+    assert refused.headers['Retry-After'] == '2'
+    assert post('10.0.0.2').status_code == 302
+    clock.now = 2.0
+    assert post().status_code == 302
+    assert db.session.scalar(db.select(db.func.count(Comments.commentid))
+                             .where(Comments.commentatorsname == 'flood')) == 4
+
+
+def test_clients_behind_the_proxy_get_their_own_buckets(monkeypatch, clock, client, game_id):
+    # as wsgi.py serves it behind one reverse proxy: every request comes from 127.0.0.1
+    monkeypatch.setattr(app, 'wsgi_app', ProxyFix(app.wsgi_app, x_for=1))
+    monkeypatch.setitem(app.extensions['rate_limiters'], 'comment', TokenBucket(1, 0.5, clock=clock))
+
+    def post(forwarded_for):
+        return client.post(f'/game/{game_id}/add_comment', data={'name': 'proxied', 'comment': 'Hello.'},
+                           headers={'X-Forwarded-For': forwarded_for}, environ_base={'REMOTE_ADDR': '127.0.0.1'})
+
+    assert post('203.0.113.1').status_code == 302
+    assert post('203.0.113.2').status_code == 302
+    assert post('203.0.113.1').status_code == 429
+    # only the entry the proxy appended is trusted, so a client cannot pick a fresh address for itself
+    assert post('198.51.100.7, 203.0.113.2').status_code == 429
@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta
+
+from app import Comments, Game, db, fts_query, highlighted, search_catalog
+
+
+def add_game(name, description='A game.', **columns):
+    game = Game(gamename=name, description=description, developer='Search Studio', publisher='Pub',
+                releasedate='01/02/2020', position=db.session.scalar(db.select(db.func.max(Game.position))) + 1,
+                **columns)
+    db.session.add(game)
+    db.session.commit()
+    return game
+
+
+def add_comment(game, text, timestamp=None):
+    comment = Comments(commentatorsname='searcher', comment=text, game_id=game.id,
+                       timestamp=timestamp or datetime(2026, 1, 1))
+    db.session.add(comment)
+    db.session.commit()
+    return comment
+
+
+def found(text):
+    games, comments = search_catalog(text)
+    return [row.id for row in games], [row.commentid for row in comments]
+
+
+def test_name_matches_outrank_description_matches():
+    in_description = add_game('Plain Title', 'Fly a quokkaplane over the sea.')
+    in_name = add_game('Quokkaplane Rising')
+
+    games, comments = search_catalog('quokkaplane')
+
+    assert [row.id for row in games] == [in_name.id, in_description.id]
+    assert games[0].name_snippet == '\x02Quokkaplane\x03 Rising'
+
+
+def test_every_word_must_match_and_plurals_find_the_stem():
+    both = add_game('Marmoset Harbor')
+    add_game('Marmoset Valley')
+
+    assert found('marmosets harbors') == ([both.id], [])
+
+
+def test_fts_syntax_in_the_query_is_treated_as_text():
+    game = add_game('Quoll NEAR Crossing')
+
+    assert fts_query('quoll" OR NEAR(crossing') == '"quoll" "OR" "NEAR" "crossing"'
+    assert found('quoll" NEAR(crossing')[0] == [game.id]
+    assert found('"*:^') == ([], [])
+
+
+def test_best_match_is_found_however_old():
+    game = add_game('Comment Host')
+    best = add_comment(game, 'Wombatron wombatron.', timestamp=datetime(2020, 1, 1))
+    for n in range(30):
+        add_comment(game, f'Newer comment {n} that mentions wombatron once among plenty of other words.',
+                    timestamp=datetime(2026, 1, 1) + timedelta(minutes=n))
+
+    games, comments = search_catalog('wombatron', limit=5)
+
+    assert len(comments) == 5
+    assert comments[0].commentid == best.commentid
+
+
+def test_highlighted_escapes_before_marking():
+    assert highlighted('<b>\x02numbat\x03</b> & co') == '&lt;b&gt;<mark>numbat</mark>&lt;/b&gt; &amp; co'
+
+
+def test_search_page_escapes_user_text(client):
+    game = add_game('Safe Host')
+    add_comment(game, '<script>alert("bilby")</script> bilby')
+    db.session.remove()
+
+    page = client.get('/search', query_string={'q': 'bilby'}).get_data(as_text=True)
+
+    assert '<script>' not in page
+    assert '&lt;script&gt;alert(&#34;<mark>bilby</mark>&#34;)&lt;/script&gt; <mark>bilby</mark>' in page
+
+
+def test_index_follows_inserts_updates_and_deletes():
+    game = add_game('Pangolin Quest')
+    comment = add_comment(game, 'The pangolin level is great.')
+    assert found('pangolin') == ([game.id], [comment.commentid])
+
+    game.gamename = 'Armadillo Quest'
+    comment.comment = 'The armadillo level is great.'
+    db.session.commit()
+    assert found('pangolin') == ([], [])
+    assert found('armadillo') == ([game.id], [comment.commentid])
+
+    db.session.delete(game)
+    db.session.commit()
+    assert found('armadillo') == ([], [])
@@ -0,0 +1,67 @@
+import hashlib
+import os
+import re
+import tempfile
+
+EXTENSION = re.compile(r'^\.[a-z0-9]{1,5}$')
+BLOB_NAME = re.compile(r'^[0-9a-f]{64}(\.[a-z0-9]{1,5})?$')
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class UploadStore:
+    """ Content-addressed storage for uploaded pictures: every distinct file is kept once, named after the sha256 of
+    its bytes, so uploading the same image twice (or for two games) never duplicates or overwrites anything. The
+    extension comes from the file's contents, never from the name the client sent. """
+
+    def __init__(self, folder, max_bytes, chunk_size=64 * 1024):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+
+    def save(self, stream, validate=None):
+        """ Copy stream into the store chunk by chunk, hashing as it goes. Returns (filename, created);
+        raises UploadTooLarge once more than max_bytes have been read. validate(path), if given, is called on
+        the complete temporary file before it is committed; whatever it raises aborts the save, and the extension
+        it returns (e.g. '.png') ends the blob's name, which otherwise has none. """
+        os.makedirs(self.folder, exist_ok=True)
+        sha = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.folder, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in iter(lambda: stream.read(self.chunk_size), b''):
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise UploadTooLarge(f'upload exceeds {self.max_bytes} bytes')
+                    sha.update(chunk)
+                    f.write(chunk)
+            extension = validate(tmp_path) if validate is not None else None
+            if extension is None or not EXTENSION.match(extension):
+                extension = ''
+            filename = sha.hexdigest() + extension
+            final_path = os.path.join(self.folder, filename)
+            if os.path.exists(final_path):
+                os.remove(tmp_path)
+                return filename, False
+            os.replace(tmp_path, final_path)
+            return filename, True
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def owns(self, filename):
+        return bool(filename) and BLOB_NAME.match(filename) is not None
+
+    def blobs(self):
+        return [name for name in os.listdir(self.folder) if self.owns(name)]
+
+    def delete(self, filename):
+        if self.owns(filename):
+            try:
+                os.remove(os.path.join(self.folder, filename))
+            except FileNotFoundError:
+                pass
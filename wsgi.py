@@ -0,0 +1,35 @@
+""" Production entry point. Serve it with a pre-forking WSGI server, which picks up gunicorn.conf.py from the
+working directory:
+
+    gunicorn wsgi:application
+
+Every worker builds its own app (and database pool) from PRODUCTION_CONFIG after the fork. Sessions stay valid
+across workers because they all sign with the SECRET_KEY from the environment or instance/secret_key.
+
+gunicorn binds to 127.0.0.1, so every request arrives from the reverse proxy in front of it. ProxyFix takes the
+client address from the X-Forwarded-For entries added by the TRUSTED_PROXIES proxies nearest to the app, so rate
+limits apply per client rather than to the proxy. Set TRUSTED_PROXIES=0 when nothing sits in front of gunicorn,
+or clients could pick their own address.
+"""
+import os
+
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from app import create_app
+
+PRODUCTION_CONFIG = {
+    'DEBUG': False,
+    'TEMPLATES_AUTO_RELOAD': False,
+    'JINJA_BYTECODE_CACHE_DIR': os.environ.get('JINJA_BYTECODE_CACHE_DIR',
+                                               os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance',
+                                                            'jinja-cache')),
+    # bundles are built once per deploy with 'flask assets build', not by every worker as it starts
+    'BUILD_ASSETS_ON_STARTUP': os.environ.get('BUILD_ASSETS_ON_STARTUP') == '1',
+    # a write only invalidates the cache of the worker that handled it; bound how long the others lag behind
+    'PAGE_CACHE_TTL': float(os.environ.get('PAGE_CACHE_TTL', 5)),
+    'TRUSTED_PROXIES': int(os.environ.get('TRUSTED_PROXIES', 1)),
+}
+
+application = create_app(PRODUCTION_CONFIG)
+if application.config['TRUSTED_PROXIES']:
+    application.wsgi_app = ProxyFix(application.wsgi_app, x_for=application.config['TRUSTED_PROXIES'])